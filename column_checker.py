@@ -1,117 +1,164 @@
 import pandas as pd
+import io
+import re
 import sys
 import os
+from collections import namedtuple
+from config.settings import Config
+from src.utils.excel_reader import load_sheet_previews, read_xlsx_headers
 
-def analyze_sheet(df, sheet_name):
-    """Analyze a specific sheet"""
-    print(f"\n📋 SHEET: '{sheet_name}'")
-    print("-" * 60)
+# Columns scored against every sheet; shared with the automation so both score sheets the same way
+REQUIRED_COLUMNS = Config.REQUIRED_COLUMNS
+REQUIRED_COLUMNS_FROZEN = Config.REQUIRED_COLUMNS_FROZEN
+
+# A sheet's data is only loaded when its header row has both of these
+CRITICAL_COLUMNS = frozenset({'ERF Sched Line Status', 'Entered by'})
+
+# Text that shows up in the first rows of pivot tables and summaries
+PIVOT_INDICATORS = [
+    'Column Labels', 'Row Labels', 'Count of', 'Sum of', 
+    'Grand Total', 'Unnamed:', 'nan'
+]
+PIVOT_PATTERN = '|'.join(map(re.escape, PIVOT_INDICATORS))
+
+# Everything the sheet report needs, gathered from the DataFrame in one pass
+SheetMeta = namedtuple('SheetMeta', ['name', 'n_rows', 'columns', 'columns_set', 'head', 'head_str', 'first_row_isna'])
+
+def build_sheet_meta(df, sheet_name, n_rows=None):
+    """Collect a sheet's metadata once; df may be a head preview when n_rows gives the full row count"""
+    head = df.head(5)
+    return SheetMeta(
+        name=sheet_name,
+        n_rows=len(df) if n_rows is None else n_rows,
+        columns=list(df.columns),
+        columns_set=set(df.columns),
+        head=head,
+        head_str=head.to_numpy(dtype=str),
+        first_row_isna=bool(len(head)) and bool(head.iloc[0].isna().all())
+    )
+
+def analyze_sheet(df, sheet_name, n_rows=None):
+    """Analyze a specific sheet; df may be a head preview when n_rows gives the full row count"""
+    # Buffer the report so each sheet costs one console write instead of dozens
+    out = io.StringIO()
+    try:
+        return _analyze_sheet(build_sheet_meta(df, sheet_name, n_rows), out)
+    finally:
+        sys.stdout.write(out.getvalue())
+
+def _analyze_sheet(meta, out):
+    """Write the sheet report to out and return (score, is_suitable)"""
+    print(f"\n📋 SHEET: '{meta.name}'", file=out)
+    print("-" * 60, file=out)
     
-    if df.empty:
-        print("   ❌ Sheet is empty")
+    if meta.n_rows == 0 or not meta.columns:
+        print("   ❌ Sheet is empty", file=out)
         return 0, False
     
     # Check if it looks like a pivot table
-    is_pivot = is_pivot_table(df)
-    if is_pivot:
-        print("   ❌ Appears to be a pivot table or summary")
+    if _is_pivot(meta):
+        print("   ❌ Appears to be a pivot table or summary", file=out)
         return 0, False
     
-    print(f"   📊 Rows: {len(df)}")
-    print(f"   📋 Columns: {len(df.columns)}")
+    print(f"   📊 Rows: {meta.n_rows}", file=out)
+    print(f"   📋 Columns: {len(meta.columns)}", file=out)
+    
+    score, has_status, has_entered_by = _report_columns(meta.columns, meta.columns_set, out)
+    
+    # Show sample data if it looks good
+    if has_status and has_entered_by and score > 5:
+        print(f"\n   📋 SAMPLE DATA (first 3 rows):", file=out)
+        print("   " + "-" * 50, file=out)
+        sample_cols = ['ERF Sched Line Status', 'Entered by']
+        if 'ERF Nr' in meta.columns_set:
+            sample_cols.append('ERF Nr')
+        if 'Material' in meta.columns_set:
+            sample_cols.append('Material')
+        
+        sample_data = meta.head[sample_cols].head(3)
+        for idx, row in enumerate(sample_data.to_dict(orient='records'), start=1):
+            print(f"   Row {idx}: {row}", file=out)
     
+    return score, (has_status and has_entered_by)
+
+def analyze_header(columns, sheet_name):
+    """Score a sheet from its header row alone, for sheets whose data is never loaded"""
+    out = io.StringIO()
+    try:
+        print(f"\n📋 SHEET: '{sheet_name}'", file=out)
+        print("-" * 60, file=out)
+        
+        if not columns:
+            print("   ❌ Sheet is empty", file=out)
+            return 0, False
+        
+        print("   ⏭️  Missing critical columns - data not loaded", file=out)
+        print(f"   📋 Columns: {len(columns)}", file=out)
+        score, _, _ = _report_columns(columns, set(columns), out)
+        return score, False
+    finally:
+        sys.stdout.write(out.getvalue())
+
+def _report_columns(columns, cols_set, out):
+    """Write the critical-column checks, score and column listing; return (score, has_status, has_entered_by)"""
     # Check for critical columns
-    has_status = 'ERF Sched Line Status' in df.columns
-    has_entered_by = 'Entered by' in df.columns
+    has_status = 'ERF Sched Line Status' in cols_set
+    has_entered_by = 'Entered by' in cols_set
     
-    print(f"   🎯 Has 'ERF Sched Line Status': {'✅' if has_status else '❌'}")
-    print(f"   🎯 Has 'Entered by': {'✅' if has_entered_by else '❌'}")
+    print(f"   🎯 Has 'ERF Sched Line Status': {'✅' if has_status else '❌'}", file=out)
+    print(f"   🎯 Has 'Entered by': {'✅' if has_entered_by else '❌'}", file=out)
     
     # Score the sheet
-    required_columns = [
-        'Plnt', 'Ship-To-Plant', 'ERF Nr', 'Item', 'Entered by',
-        'Material', 'Material Description', 'Unit', 'ERF Itm Qty',
-        'Date Req.', 'ERF Sched Line Status', 'Due Date', 'Expeditor',
-        'Expeditor Status', 'ETA', 'Expeditor Remarks', 'END'
-    ]
-    
-    score = 0
-    found_columns = []
-    missing_columns = []
-    
-    for col in required_columns:
-        if col in df.columns:
-            score += 1
-            found_columns.append(col)
-        else:
-            missing_columns.append(col)
+    found_set = REQUIRED_COLUMNS_FROZEN & cols_set
+    score = len(found_set)
+    found_columns = [col for col in REQUIRED_COLUMNS if col in found_set]
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in found_set]
     
-    print(f"   📈 Score: {score}/{len(required_columns)} required columns found")
+    print(f"   📈 Score: {score}/{len(REQUIRED_COLUMNS)} required columns found", file=out)
     
     # Show column details
-    print(f"\n   📝 ALL COLUMNS IN THIS SHEET:")
-    for i, col in enumerate(df.columns, 1):
-        status = "✅" if col in required_columns else "📋"
-        print(f"      {i:2d}. {status} '{col}'")
+    print(f"\n   📝 ALL COLUMNS IN THIS SHEET:", file=out)
+    for i, col in enumerate(columns, 1):
+        status = "✅" if col in REQUIRED_COLUMNS_FROZEN else "📋"
+        print(f"      {i:2d}. {status} '{col}'", file=out)
     
     if found_columns:
-        print(f"\n   ✅ FOUND REQUIRED COLUMNS ({len(found_columns)}):")
+        print(f"\n   ✅ FOUND REQUIRED COLUMNS ({len(found_columns)}):", file=out)
         for col in found_columns[:10]:  # Show first 10
-            print(f"      • '{col}'")
+            print(f"      • '{col}'", file=out)
         if len(found_columns) > 10:
-            print(f"      ... and {len(found_columns) - 10} more")
+            print(f"      ... and {len(found_columns) - 10} more", file=out)
     
     if missing_columns:
-        print(f"\n   ❌ MISSING REQUIRED COLUMNS ({len(missing_columns)}):")
+        print(f"\n   ❌ MISSING REQUIRED COLUMNS ({len(missing_columns)}):", file=out)
         for col in missing_columns[:10]:  # Show first 10
-            print(f"      • '{col}'")
+            print(f"      • '{col}'", file=out)
         if len(missing_columns) > 10:
-            print(f"      ... and {len(missing_columns) - 10} more")
-    
-    # Show sample data if it looks good
-    if has_status and has_entered_by and score > 5:
-        print(f"\n   📋 SAMPLE DATA (first 3 rows):")
-        print("   " + "-" * 50)
-        sample_cols = ['ERF Sched Line Status', 'Entered by']
-        if 'ERF Nr' in df.columns:
-            sample_cols.append('ERF Nr')
-        if 'Material' in df.columns:
-            sample_cols.append('Material')
-        
-        sample_data = df[sample_cols].head(3)
-        for idx, row in sample_data.iterrows():
-            print(f"   Row {idx + 1}: {dict(row)}")
+            print(f"      ... and {len(missing_columns) - 10} more", file=out)
     
-    return score, (has_status and has_entered_by)
+    return score, has_status, has_entered_by
 
 def is_pivot_table(df):
     """Check if the dataframe looks like a pivot table"""
-    if len(df) < 3:
+    return _is_pivot(build_sheet_meta(df, None))
+
+def _is_pivot(meta):
+    """Pivot check on precomputed sheet metadata"""
+    if meta.n_rows < 3:
         return False
     
-    # Convert to string and check for common pivot table patterns
-    first_rows = df.head(5).astype(str)
-    
-    # Look for pivot table indicators
-    pivot_indicators = [
-        'Column Labels', 'Row Labels', 'Count of', 'Sum of', 
-        'Grand Total', 'Unnamed:', 'nan'
-    ]
-    
-    for indicator in pivot_indicators:
-        if any(indicator in str(cell) for row in first_rows.values for cell in row):
-            return True
-    
-    # Check if first row is all NaN
-    if df.iloc[0].isna().all():
+    # Cheap O(columns) checks first: many unnamed columns...
+    unnamed_count = sum(1 for col in meta.columns if str(col).startswith('Unnamed:'))
+    if unnamed_count > len(meta.columns) * 0.5:
         return True
     
-    # Check if there are many unnamed columns
-    unnamed_cols = [col for col in df.columns if 'Unnamed:' in str(col)]
-    if len(unnamed_cols) > len(df.columns) * 0.5:
+    # ...or an all-NaN first row
+    if meta.first_row_isna:
         return True
     
-    return False
+    # Then scan the stringified head for pivot table indicators in one regex pass
+    first_cells = pd.Series(meta.head_str.ravel())
+    return bool(first_cells.str.contains(PIVOT_PATTERN, regex=True).any())
 
 def check_excel_file(file_path):
     """Check all sheets in Excel file and find the best one for ERF data"""
@@ -120,9 +167,16 @@ def check_excel_file(file_path):
         print("=" * 60)
         print(f"📁 File: {file_path}")
         
-        # Get all sheet names
-        excel_file = pd.ExcelFile(file_path)
-        sheet_names = excel_file.sheet_names
+        # Score sheets from their XML header rows first; only sheets with both critical
+        # columns get their data parsed (previews are cached on disk per workbook version)
+        headers = read_xlsx_headers(file_path)
+        if headers is None:
+            metadata = load_sheet_previews(file_path)
+            sheet_names = metadata['sheet_names']
+        else:
+            sheet_names = list(headers)
+            candidates = [name for name in sheet_names if CRITICAL_COLUMNS <= set(headers[name])]
+            metadata = load_sheet_previews(file_path, candidates)
         
         print(f"📊 Total sheets found: {len(sheet_names)}")
         print(f"📋 Sheet names: {sheet_names}")
@@ -134,14 +188,22 @@ def check_excel_file(file_path):
         # Analyze each sheet
         for sheet_name in sheet_names:
             try:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-                score, is_suitable = analyze_sheet(df, sheet_name)
+                preview = metadata['sheets'].get(sheet_name)
+                if preview is None:
+                    score, is_suitable = analyze_header(headers[sheet_name], sheet_name)
+                    rows = None
+                else:
+                    if 'error' in preview:
+                        raise ValueError(preview['error'])
+                    
+                    score, is_suitable = analyze_sheet(preview['head'], sheet_name, preview['rows'])
+                    rows = preview['rows']
                 
                 sheet_results.append({
                     'name': sheet_name,
                     'score': score,
                     'suitable': is_suitable,
-                    'rows': len(df) if not df.empty else 0
+                    'rows': rows
                 })
                 
                 if is_suitable and score > best_score:
@@ -160,11 +222,11 @@ def check_excel_file(file_path):
         print(f"📊 SHEET SCORES:")
         for result in sorted(sheet_results, key=lambda x: x['score'], reverse=True):
             status = "🎯 BEST" if result['name'] == best_sheet else "✅ GOOD" if result['suitable'] else "❌ SKIP"
-            print(f"   {status} '{result['name']}' - Score: {result['score']}/16, Rows: {result['rows']}")
+            print(f"   {status} '{result['name']}' - Score: {result['score']}/{len(REQUIRED_COLUMNS)}, Rows: {'n/a' if result['rows'] is None else result['rows']}")
         
         if best_sheet:
             print(f"\n🎉 RECOMMENDED SHEET: '{best_sheet}'")
-            print(f"   📈 Score: {best_score}/16 required columns")
+            print(f"   📈 Score: {best_score}/{len(REQUIRED_COLUMNS)} required columns")
             print(f"   ✅ This sheet should work with the ERF automation system")
             
             # Show what the system will do
@@ -1,8 +1,15 @@
 """Configuration settings for the ERF Email Automation system"""
 import os
 import json
+import functools
 from dotenv import load_dotenv
 
+# orjson parses/serializes JSON several times faster; the stdlib json module is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Load environment variables
 load_dotenv()
 
@@ -14,6 +21,12 @@ class Config:
     SENDER_DISPLAY_NAME = os.getenv('SENDER_DISPLAY_NAME', 'Proto4Lab Team')
     LAM_DOMAIN = os.getenv('LAM_DOMAIN', 'lamresearch.com')
     TEST_MODE = os.getenv('TEST_MODE', 'True').lower() == 'true'
+    # Worker threads sending through Outlook in send_bulk_emails (1 = send serially)
+    EMAIL_SEND_WORKERS = int(os.getenv('EMAIL_SEND_WORKERS', '4'))
+    # Emails send_bulk_emails takes from its input at a time (bounds memory for streamed sends)
+    EMAIL_SEND_CHUNK_SIZE = int(os.getenv('EMAIL_SEND_CHUNK_SIZE', '100'))
+    # Worker processes rendering per-requester charts (1 = render serially)
+    CHART_WORKERS = int(os.getenv('CHART_WORKERS', str(os.cpu_count() or 1)))
     
     # Outlook search settings
     SEARCH_OUTLOOK_CONTACTS = os.getenv('SEARCH_OUTLOOK_CONTACTS', 'True').lower() == 'true'
@@ -30,9 +43,19 @@ class Config:
         'ERF Sched Line Status', 'END', 'PO Due Date', 'Expeditor',
         'Expeditor Status',  'Expeditor Remarks'
     ]
+    # Built once at import for O(1) membership tests; REQUIRED_COLUMNS keeps display order
+    REQUIRED_COLUMNS_FROZEN = frozenset(REQUIRED_COLUMNS)
+    
+    # Low-cardinality columns read as categoricals (int codes instead of one string per row)
+    COLUMN_DTYPES = {
+        'ERF Sched Line Status': 'category',
+        'Entered by': 'category',
+        'Expeditor Status': 'category'
+    }
     
     # Status filters
     TARGET_STATUSES = ['On order', 'Received']
+    TARGET_STATUSES_FROZEN = frozenset(TARGET_STATUSES)
     
     # Email settings
     EMAIL_SUBJECT_TEMPLATE = "ERF Status Update - {count} Items"
@@ -45,14 +68,26 @@ class Config:
     
     @classmethod
     def load_test_config(cls):
-        """Load test configuration file"""
-        if os.path.exists(cls.TEST_CONFIG_FILE):
-            with open(cls.TEST_CONFIG_FILE, 'r') as f:
-                return json.load(f)
-        return None
+        """Load test configuration file (parsed once per file version; treat the result as read-only)"""
+        try:
+            stat = os.stat(cls.TEST_CONFIG_FILE)
+        except OSError:
+            return None
+        return _read_json_file(cls.TEST_CONFIG_FILE, stat.st_mtime_ns, stat.st_size)
     
     @classmethod
     def save_test_config(cls, config_data):
         """Save test configuration file"""
-        with open(cls.TEST_CONFIG_FILE, 'w') as f:
-            json.dump(config_data, f, indent=2)
\ No newline at end of file
+        if orjson is not None:
+            with open(cls.TEST_CONFIG_FILE, 'wb') as f:
+                f.write(orjson.dumps(config_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            with open(cls.TEST_CONFIG_FILE, 'w') as f:
+                json.dump(config_data, f, indent=2)
+
+@functools.lru_cache(maxsize=1)
+def _read_json_file(path, mtime_ns, size):
+    """Parse a JSON file; mtime and size are part of the cache key so edits are picked up"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
@@ -2,10 +2,20 @@
 """Extract all users from ERF file and create complete email mapping using Outlook auto-complete"""
 
 import pandas as pd
+import numpy as np
+import pythoncom
 import win32com.client
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import os
+from config.settings import Config
+from src.utils.excel_reader import excel_engine_options, read_header_row
+
+# Users resolved per draft mail item in bulk_resolve_all_users
+RESOLVE_BATCH_SIZE = 50
+
+# Worker threads overlapping Outlook/Exchange round trips in bulk_resolve_all_users
+RESOLVE_WORKERS = 8
 
 class EmailMappingGenerator:
     """Generate email mapping from ERF data using Outlook auto-complete"""
@@ -30,15 +40,15 @@ class EmailMappingGenerator:
         print(f"📊 Reading ERF file: {erf_file_path}")
         
         try:
-            # Read the Excel file and find the Main data sheet
-            excel_file = pd.ExcelFile(erf_file_path)
+            # Open the workbook once and reuse the handle for every sheet read
+            excel_file = pd.ExcelFile(erf_file_path, **excel_engine_options(erf_file_path))
             sheet_names = excel_file.sheet_names
             
             # Find the sheet with ERF data (likely 'Main data')
             target_sheet = None
             for sheet in sheet_names:
-                df_test = pd.read_excel(erf_file_path, sheet_name=sheet, nrows=1)
-                if 'Entered by' in df_test.columns:
+                # Only the header row is needed to spot the data sheet
+                if 'Entered by' in read_header_row(excel_file, sheet):
                     target_sheet = sheet
                     break
             
@@ -48,18 +58,13 @@ class EmailMappingGenerator:
             
             print(f"📋 Using sheet: '{target_sheet}'")
             
-            # Read the full sheet
-            df = pd.read_excel(erf_file_path, sheet_name=target_sheet)
+            # Read only the 'Entered by' column, as a categorical; the rest of the sheet is never used here
+            df = excel_file.parse(target_sheet, usecols=['Entered by'], dtype=Config.COLUMN_DTYPES)
             
-            # Extract unique users from 'Entered by' column
-            if 'Entered by' not in df.columns:
-                print("❌ 'Entered by' column not found")
-                return []
-            
-            # Get unique, non-null users
-            users = df['Entered by'].dropna().unique()
-            users = [str(user).strip() for user in users if str(user).strip()]
-            users = sorted(list(set(users)))  # Remove duplicates and sort
+            # Get unique, non-blank users: the categories are already the distinct names, so only
+            # those get stripped, then a hash-based unique and a NumPy sort
+            names = pd.Series(df['Entered by'].cat.categories).astype('string').str.strip()
+            users = np.sort(names[names != ''].unique().to_numpy(dtype=object)).tolist()
             
             print(f"📋 Found {len(users)} unique users:")
             for i, user in enumerate(users, 1):
@@ -71,14 +76,32 @@ class EmailMappingGenerator:
             print(f"❌ Error reading ERF file: {e}")
             return []
     
-    def resolve_email_autocomplete(self, username):
+    def _recipient_email(self, recipient):
+        """Return the SMTP address of a resolved recipient, or None"""
+        resolved_email = recipient.Address
+        
+        # If it's an Exchange address, get SMTP address
+        if resolved_email.startswith('/'):
+            try:
+                exchange_user = recipient.AddressEntry.GetExchangeUser()
+                if exchange_user:
+                    resolved_email = exchange_user.PrimarySmtpAddress
+            except:
+                pass
+        
+        if resolved_email and '@' in resolved_email:
+            return resolved_email
+        return None
+    
+    def resolve_email_autocomplete(self, username, outlook=None):
         """Resolve single email using Outlook auto-complete"""
-        if not self.outlook:
+        outlook = outlook or self.outlook
+        if not outlook:
             return None
         
         try:
             # Create a mail item
-            mail = self.outlook.CreateItem(0)
+            mail = outlook.CreateItem(0)
             mail.To = username
             
             # Try to resolve the recipient
@@ -87,31 +110,84 @@ class EmailMappingGenerator:
                 recipient = recipients.Item(1)
                 
                 if recipient.Resolve():
-                    resolved_email = recipient.Address
-                    
-                    # If it's an Exchange address, get SMTP address
-                    if resolved_email.startswith('/'):
-                        try:
-                            exchange_user = recipient.AddressEntry.GetExchangeUser()
-                            if exchange_user:
-                                resolved_email = exchange_user.PrimarySmtpAddress
-                        except:
-                            pass
-                    
-                    # Clean up
-                    mail = None
-                    
-                    if resolved_email and '@' in resolved_email:
-                        return resolved_email
+                    return self._recipient_email(recipient)
             
-            # Clean up if failed
-            mail = None
             return None
             
         except Exception as e:
             print(f"      Error resolving {username}: {e}")
             return None
     
+    def resolve_batch_autocomplete(self, usernames, outlook=None):
+        """Resolve a batch of users through a single draft mail item"""
+        outlook = outlook or self.outlook
+        results = {}
+        mail = None
+        
+        try:
+            mail = outlook.CreateItem(0)
+            recipients = mail.Recipients
+            
+            # One recipient per user keeps a 1:1 mapping back to the usernames
+            for username in usernames:
+                recipients.Add(username)
+            recipients.ResolveAll()
+            
+            for index, username in enumerate(usernames, 1):
+                recipient = recipients.Item(index)
+                results[username] = self._recipient_email(recipient) if recipient.Resolved else None
+                
+        except Exception as e:
+            print(f"      Batch resolution failed, resolving one by one: {e}")
+            for username in usernames:
+                if username not in results:
+                    results[username] = self.resolve_email_autocomplete(username, outlook)
+        finally:
+            # Discard the draft without saving (1 = olDiscard)
+            if mail is not None:
+                try:
+                    mail.Close(1)
+                except Exception:
+                    pass
+        
+        return results
+    
+    def _resolve_batch_in_thread(self, usernames):
+        """Resolve a batch on a worker thread with its own COM apartment and Outlook handle"""
+        pythoncom.CoInitialize()
+        try:
+            # COM objects can't be shared across apartments, so each worker dispatches its own
+            outlook = win32com.client.Dispatch("Outlook.Application")
+            try:
+                return self.resolve_batch_autocomplete(usernames, outlook)
+            finally:
+                del outlook
+        finally:
+            pythoncom.CoUninitialize()
+    
+    def load_gal_index(self):
+        """Enumerate the Global Address List once into an alias/name -> SMTP lookup"""
+        gal_index = {}
+        
+        try:
+            entries = self.outlook.Session.GetGlobalAddressList().AddressEntries
+            for entry in entries:
+                try:
+                    exchange_user = entry.GetExchangeUser()
+                    if not exchange_user or not exchange_user.PrimarySmtpAddress:
+                        continue
+                    
+                    email = exchange_user.PrimarySmtpAddress
+                    for key in (exchange_user.Alias, entry.Name):
+                        if key:
+                            gal_index.setdefault(str(key).strip().upper(), email)
+                except Exception:
+                    continue
+        except Exception as e:
+            print(f"⚠️  Could not read Global Address List: {e}")
+        
+        return gal_index
+    
     def bulk_resolve_all_users(self, users):
         """Resolve emails for all users"""
         if not self.connect_outlook():
@@ -121,10 +197,34 @@ class EmailMappingGenerator:
         print(f"\n🔍 Resolving emails for {total} users using Outlook auto-complete...")
         print("=" * 70)
         
+        # One GAL enumeration turns most lookups into dictionary hits
+        gal_index = self.load_gal_index()
+        resolved = {user: gal_index.get(str(user).strip().upper()) for user in users}
+        pending = [user for user in users if not resolved[user]]
+        
+        # Resolve the remainder in batches (one Outlook round trip each), spread across
+        # worker threads so Exchange latency overlaps instead of adding up
+        batch_size = min(RESOLVE_BATCH_SIZE, -(-len(pending) // RESOLVE_WORKERS)) or 1
+        batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+        
+        if len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=RESOLVE_WORKERS) as executor:
+                futures = {executor.submit(self._resolve_batch_in_thread, batch): batch for batch in batches}
+                for future in as_completed(futures):
+                    try:
+                        resolved.update(future.result())
+                    except Exception as e:
+                        # COM marshaling can fail on some Outlook setups; retry on the main thread
+                        print(f"      Threaded resolution failed, retrying serially: {e}")
+                        resolved.update(self.resolve_batch_autocomplete(futures[future]))
+        else:
+            for batch in batches:
+                resolved.update(self.resolve_batch_autocomplete(batch))
+        
         for i, user in enumerate(users, 1):
             print(f"{i:2d}/{total}: {user:<15} ", end="")
             
-            email = self.resolve_email_autocomplete(user)
+            email = resolved.get(user)
             
             if email:
                 self.resolved_emails[user] = email
@@ -132,9 +232,6 @@ class EmailMappingGenerator:
             else:
                 self.failed_resolutions.append(user)
                 print("-> NOT FOUND")
-            
-            # Small delay to avoid overwhelming Outlook
-            time.sleep(0.2)
         
         print("=" * 70)
         print(f"✅ Resolved: {len(self.resolved_emails)}")
@@ -143,30 +240,22 @@ class EmailMappingGenerator:
     
     def create_mapping_excel(self, output_file):
         """Create clean email mapping Excel file"""
-        mapping_data = []
-        
-        # Add resolved mappings
-        for username, email in self.resolved_emails.items():
-            mapping_data.append({
-                'Username': username,
-                'Email': email,
-                'Status': 'RESOLVED',
-                'Method': 'Outlook Auto-Complete',
-                'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
-        
-        # Add failed resolutions for manual completion
-        for username in self.failed_resolutions:
-            mapping_data.append({
-                'Username': username,
-                'Email': '',  # Empty for manual filling
-                'Status': 'NEEDS_MANUAL_INPUT',
-                'Method': 'Auto-Complete Failed',
-                'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        # Add resolved mappings (rows are tuples; the columns are named once below)
+        mapping_rows = [
+            (username, email, 'RESOLVED', 'Outlook Auto-Complete', timestamp)
+            for username, email in self.resolved_emails.items()
+        ]
+        
+        # Add failed resolutions for manual completion (Email left empty for manual filling)
+        mapping_rows.extend(
+            (username, '', 'NEEDS_MANUAL_INPUT', 'Auto-Complete Failed', timestamp)
+            for username in self.failed_resolutions
+        )
         
         # Create DataFrame and save
-        df = pd.DataFrame(mapping_data)
+        df = pd.DataFrame.from_records(mapping_rows, columns=['Username', 'Email', 'Status', 'Method', 'Timestamp'])
         df.to_excel(output_file, index=False)
         
         print(f"\n📁 Email mapping saved to: {output_file}")
@@ -182,14 +271,7 @@ class EmailMappingGenerator:
             return
         
         # Create simple format: Username | Email
-        simple_data = []
-        for username, email in self.resolved_emails.items():
-            simple_data.append({
-                'Eng': username,
-                'Email': email
-            })
-        
-        df = pd.DataFrame(simple_data)
+        df = pd.DataFrame.from_records(list(self.resolved_emails.items()), columns=['Eng', 'Email'])
         df.to_excel(output_file, index=False)
         
         print(f"📁 Simple mapping for resolver saved to: {output_file}")
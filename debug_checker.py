@@ -1,6 +1,8 @@
 import pandas as pd
+import numpy as np
 import sys
 import os
+from src.utils.excel_reader import excel_engine_options, load_sheet_previews
 
 def debug_sheet(file_path, sheet_name):
     """Debug a specific sheet to see what's going wrong"""
@@ -9,15 +11,14 @@ def debug_sheet(file_path, sheet_name):
         print("=" * 60)
         
         # Read the sheet
-        df = pd.read_excel(file_path, sheet_name=sheet_name)
+        df = pd.read_excel(file_path, sheet_name=sheet_name, **excel_engine_options(file_path))
         
         print(f"📊 Rows: {len(df)}")
         print(f"📋 Columns: {len(df.columns)}")
         
         print(f"\n📝 ALL COLUMN NAMES:")
         print("-" * 50)
-        for i, col in enumerate(df.columns, 1):
-            print(f"{i:2d}. '{col}'")
+        print("\n".join(f"{i:2d}. '{col}'" for i, col in enumerate(df.columns, 1)))
         
         print(f"\n📋 FIRST 5 ROWS:")
         print("-" * 50)
@@ -39,23 +40,21 @@ def debug_sheet(file_path, sheet_name):
         print(f"\n🔍 CHECKING FOR SIMILAR COLUMN NAMES:")
         print("-" * 50)
         
+        # Lowercase the column names once; np.char.find then scans them all per word in C
+        cols_lower = np.array([str(col).lower() for col in df.columns], dtype=str)
+        
         for target in target_cols:
             print(f"\nLooking for variations of '{target}':")
-            variations = []
+            target_words = target.lower().split()
             
-            for col in df.columns:
-                col_str = str(col).lower()
-                target_words = target.lower().split()
-                
-                # Check if any words match
-                matches = sum(1 for word in target_words if word in col_str)
-                if matches > 0:
-                    variations.append((col, matches))
+            # Count how many target words appear in each column name
+            matches = np.sum([np.char.find(cols_lower, word) >= 0 for word in target_words], axis=0)
             
-            if variations:
-                variations.sort(key=lambda x: x[1], reverse=True)
-                for col, match_count in variations[:3]:
-                    print(f"   📋 '{col}' (matches: {match_count})")
+            # Stable sort keeps column order among equal match counts
+            best = [i for i in np.argsort(-matches, kind='stable')[:3] if matches[i] > 0]
+            if best:
+                for i in best:
+                    print(f"   📋 '{df.columns[i]}' (matches: {matches[i]})")
             else:
                 print(f"   ❌ No similar columns found")
         
@@ -68,18 +67,22 @@ def debug_sheet(file_path, sheet_name):
 def quick_fix_check(file_path):
     """Quick check to see what we're dealing with"""
     try:
-        excel_file = pd.ExcelFile(file_path)
-        sheet_names = excel_file.sheet_names
+        # Shares the on-disk sheet preview cache with column_checker
+        metadata = load_sheet_previews(file_path)
+        sheet_names = metadata['sheet_names']
         
         print("🚀 QUICK ANALYSIS OF ALL SHEETS")
         print("=" * 60)
         
         for sheet_name in sheet_names:
             try:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
+                preview = metadata['sheets'][sheet_name]
+                if 'error' in preview:
+                    raise ValueError(preview['error'])
+                df = preview['head']
                 
                 # Basic info
-                print(f"\n📋 {sheet_name}: {len(df)} rows, {len(df.columns)} columns")
+                print(f"\n📋 {sheet_name}: {preview['rows']} rows, {len(df.columns)} columns")
                 
                 # Show first few column names
                 cols_preview = list(df.columns)[:5]
@@ -1,11 +1,53 @@
 # src/data/excel_processor.py - FIXED VERSION
 """Excel data processing module with improved multi-sheet support"""
+import os
+from collections.abc import Mapping
+import numpy as np
 import pandas as pd
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, FrozenSet, List, Tuple, Optional
 from src.utils.logger import setup_logger
 from src.utils.validators import validate_excel_file
+from src.utils.excel_reader import excel_engine_options, read_sheet_rows
+from src.utils.sheet_cache import load_cached_frame, load_cached_metadata, save_cached_frame, save_cached_metadata
 from config.settings import Config
 
+# Rows read per sheet while choosing the data sheet; the pivot check looks at the first five
+PEEK_ROWS = 5
+
+class _LazyGroupDict(Mapping):
+    """Read-only {requester: items} view that slices a group out of the data only when accessed"""
+    
+    def __init__(self, df: pd.DataFrame, indices: Dict[Any, Any], convert):
+        self._df = df
+        self._indices = indices
+        self._convert = convert
+    
+    def __getitem__(self, name) -> pd.DataFrame:
+        return self._convert(self._df.iloc[self._indices[name]])
+    
+    def __iter__(self):
+        return iter(self._indices)
+    
+    def __len__(self) -> int:
+        return len(self._indices)
+
+class _LazyGroupArrays(Mapping):
+    """Read-only {requester: {column: values}} view; each group's arrays are taken only when accessed"""
+    
+    def __init__(self, arrays: Dict[str, np.ndarray], indices: Dict[Any, Any]):
+        self._arrays = arrays
+        self._indices = indices
+    
+    def __getitem__(self, name) -> Dict[str, np.ndarray]:
+        positions = self._indices[name]
+        return {col: values[positions] for col, values in self._arrays.items()}
+    
+    def __iter__(self):
+        return iter(self._indices)
+    
+    def __len__(self) -> int:
+        return len(self._indices)
+
 class ExcelProcessor:
     """Handles Excel file processing and data filtering with multi-sheet support"""
     
@@ -14,99 +56,174 @@ class ExcelProcessor:
         self.raw_data = None
         self.filtered_data = None
         self.grouped_data = None
+        self._grouped_source = None
         self.selected_sheet = None
+        # (filtered frame, status breakdown) from the last get_summary call
+        self._status_breakdown_cache = None
+        # (sheet name, data) selected from the last workbook, keyed by (path, mtime, size)
+        self._sheet_cache_key = None
+        self._sheet_cache = None
     
     def find_data_sheet(self, file_path: str) -> Tuple[bool, Optional[str], Optional[pd.DataFrame]]:
         """Find the sheet that contains actual ERF data"""
         try:
-            # Get all sheet names
-            excel_file = pd.ExcelFile(file_path)
-            sheet_names = excel_file.sheet_names
-            
-            self.logger.info(f"Found {len(sheet_names)} sheets: {sheet_names}")
+            # The selected sheet is parsed once per file version
+            stat = os.stat(file_path)
+            cache_key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+            if cache_key == self._sheet_cache_key:
+                best_sheet, best_data = self._sheet_cache
+                self.logger.info(f"🎯 Reusing already parsed sheet: '{best_sheet}'")
+                return True, best_sheet, best_data
             
-            best_sheet = None
-            best_score = 0
-            best_data = None
+            # A previous run may have left this workbook version's selected sheet on disk
+            cached = self._load_cached_selection(file_path)
+            if cached is not None:
+                best_sheet, best_data = cached
+                self.logger.info(f"🎯 Loaded sheet '{best_sheet}' from cache: {file_path}")
+                self._sheet_cache_key = cache_key
+                self._sheet_cache = cached
+                return True, best_sheet, best_data
             
-            for sheet_name in sheet_names:
-                self.logger.info(f"Analyzing sheet: '{sheet_name}'")
+            # Every read below shares one open workbook handle
+            with pd.ExcelFile(file_path, **excel_engine_options(file_path)) as excel_file:
+                sheet_names = excel_file.sheet_names
                 
-                try:
-                    # Read the sheet
-                    df = pd.read_excel(file_path, sheet_name=sheet_name)
-                    
-                    # Skip empty sheets
-                    if df.empty:
-                        self.logger.info(f"  ❌ Sheet '{sheet_name}' is empty")
-                        continue
-                    
-                    # Check for critical columns first (this is the key fix!)
-                    has_status = 'ERF Sched Line Status' in df.columns
-                    has_entered_by = 'Entered by' in df.columns
+                self.logger.info(f"Found {len(sheet_names)} sheets: {sheet_names}")
+                
+                best_sheet = None
+                best_score = 0
+                best_columns = None
+                
+                for sheet_name in sheet_names:
+                    self.logger.info(f"Analyzing sheet: '{sheet_name}'")
                     
-                    if not (has_status and has_entered_by):
-                        self.logger.info(f"  ❌ Sheet '{sheet_name}' missing critical columns")
-                        missing = []
-                        if not has_status:
-                            missing.append("'ERF Sched Line Status'")
-                        if not has_entered_by:
-                            missing.append("'Entered by'")
-                        self.logger.info(f"      Missing: {', '.join(missing)}")
-                        continue
+                    try:
+                        # Peek at the header plus a few rows; enough for every check below
+                        df = self._peek_sheet(excel_file, sheet_name)
+                        
+                        # Skip empty sheets
+                        if df.empty:
+                            self.logger.info(f"  ❌ Sheet '{sheet_name}' is empty")
+                            continue
+                        
+                        # Check for critical columns first (this is the key fix!)
+                        has_status = 'ERF Sched Line Status' in df.columns
+                        has_entered_by = 'Entered by' in df.columns
+                        
+                        if not (has_status and has_entered_by):
+                            self.logger.info(f"  ❌ Sheet '{sheet_name}' missing critical columns")
+                            missing = []
+                            if not has_status:
+                                missing.append("'ERF Sched Line Status'")
+                            if not has_entered_by:
+                                missing.append("'Entered by'")
+                            self.logger.info(f"      Missing: {', '.join(missing)}")
+                            continue
+                        
+                        # Normalize the header once; the pivot check and the score share it
+                        col_set = frozenset(str(col).strip() for col in df.columns)
+                        
+                        # If we have critical columns, check if it's a real pivot table
+                        if self._is_real_pivot_table(df, col_set):
+                            self.logger.info(f"  ❌ Sheet '{sheet_name}' appears to be a pivot table")
+                            continue
+                        
+                        # Score the sheet based on how many required columns it has
+                        score = self._score_sheet(col_set)
+                        self.logger.info(f"  📊 Sheet '{sheet_name}' score: {score}/{len(Config.REQUIRED_COLUMNS)}")
+                        self.logger.info(f"  ✅ Sheet '{sheet_name}' has critical columns and real data")
+                        
+                        if score > best_score:
+                            best_sheet = sheet_name
+                            best_score = score
+                            best_columns = list(dict.fromkeys(col for col in df.columns if col in Config.REQUIRED_COLUMNS_FROZEN))
                     
-                    # If we have critical columns, check if it's a real pivot table
-                    if self._is_real_pivot_table(df):
-                        self.logger.info(f"  ❌ Sheet '{sheet_name}' appears to be a pivot table")
+                    except Exception as e:
+                        self.logger.warning(f"  ❌ Error reading sheet '{sheet_name}': {str(e)}")
                         continue
-                    
-                    # Score the sheet based on how many required columns it has
-                    score = self._score_sheet(df)
-                    self.logger.info(f"  📊 Sheet '{sheet_name}' score: {score}/{len(Config.REQUIRED_COLUMNS)}")
-                    self.logger.info(f"  ✅ Sheet '{sheet_name}' has critical columns and real data")
-                    
-                    if score > best_score:
-                        best_sheet = sheet_name
-                        best_score = score
-                        best_data = df
                 
-                except Exception as e:
-                    self.logger.warning(f"  ❌ Error reading sheet '{sheet_name}': {str(e)}")
-                    continue
-            
-            if best_sheet:
+                if not best_sheet:
+                    self.logger.error("❌ No suitable data sheet found")
+                    return False, None, None
+                
+                # Only the winning sheet is read in full, and only its required columns;
+                # status/requester columns come back as categoricals
                 self.logger.info(f"🎯 Selected sheet: '{best_sheet}' with score {best_score}")
-                return True, best_sheet, best_data
-            else:
-                self.logger.error("❌ No suitable data sheet found")
-                return False, None, None
+                best_data = excel_file.parse(best_sheet, usecols=best_columns, dtype=Config.COLUMN_DTYPES)
+            
+            self._sheet_cache_key = cache_key
+            self._sheet_cache = (best_sheet, best_data)
+            self._save_cached_selection(file_path, best_sheet, best_data)
+            return True, best_sheet, best_data
                 
         except Exception as e:
             self.logger.error(f"Error analyzing Excel file: {str(e)}")
             return False, None, None
     
-    def _is_real_pivot_table(self, df: pd.DataFrame) -> bool:
+    def _peek_sheet(self, excel_file: pd.ExcelFile, sheet_name: str) -> pd.DataFrame:
+        """Build a small frame from the sheet's header and first PEEK_ROWS rows
+        
+        The rows come straight from the reader as value tuples (calamine, or openpyxl in
+        read-only mode), skipping pandas' parser and per-column type inference.
+        """
+        rows = read_sheet_rows(excel_file, sheet_name, PEEK_ROWS + 1)
+        # Empty cells come back as None (openpyxl) or '' (calamine); pandas reads both as NaN
+        rows = [tuple(None if value == '' else value for value in row) for row in rows]
+        
+        # Trailing blank rows aren't data, as with pandas' own reader
+        while rows and all(value is None for value in rows[-1]):
+            rows.pop()
+        if not rows:
+            return pd.DataFrame()
+        
+        # openpyxl's read-only rows can be ragged; pad them to the widest row
+        width = max(map(len, rows))
+        rows = [row + (None,) * (width - len(row)) for row in rows]
+        
+        header = [f"Unnamed: {i}" if value is None else value for i, value in enumerate(rows[0])]
+        return pd.DataFrame(rows[1:], columns=header)
+    
+    def _cache_settings(self) -> Tuple:
+        """Settings baked into a cached sheet; changing them invalidates the cache"""
+        return tuple(Config.REQUIRED_COLUMNS), tuple(Config.COLUMN_DTYPES.items())
+    
+    def _load_cached_selection(self, file_path: str) -> Optional[Tuple[str, pd.DataFrame]]:
+        """Return (sheet name, data) cached on disk for this workbook version, or None"""
+        selection = load_cached_metadata(file_path, 'selected_sheet')
+        if not selection or selection.get('settings') != self._cache_settings():
+            return None
+        
+        data = load_cached_frame(file_path, 'sheet_data')
+        if data is None:
+            return None
+        return selection['sheet'], data
+    
+    def _save_cached_selection(self, file_path: str, sheet_name: str, data: pd.DataFrame):
+        """Store the selected sheet on disk so the next run skips the Excel parse"""
+        # Data first, so the selection record never points at a missing frame
+        save_cached_frame(file_path, 'sheet_data', data)
+        save_cached_metadata(file_path, 'selected_sheet', {'sheet': sheet_name, 'settings': self._cache_settings()})
+    
+    def _is_real_pivot_table(self, df: pd.DataFrame, col_set: Optional[FrozenSet[str]] = None) -> bool:
         """More accurate check if the dataframe is actually a pivot table"""
         if len(df) < 3:
             return False
         
+        if col_set is None:
+            col_set = frozenset(str(col).strip() for col in df.columns)
+        
         # Check if more than 70% of columns are unnamed (strong indicator)
-        unnamed_cols = [col for col in df.columns if 'Unnamed:' in str(col)]
-        if len(unnamed_cols) > len(df.columns) * 0.7:
+        unnamed_count = sum(1 for col in col_set if col.startswith('Unnamed:'))
+        if unnamed_count > len(df.columns) * 0.7:
             return True
         
         # Check if first row is mostly NaN (common in pivot tables)
-        if df.iloc[0].isna().sum() > len(df.columns) * 0.8:
+        if df.iloc[0].isna().to_numpy().sum() > len(df.columns) * 0.8:
             return True
         
-        # Check for specific pivot table patterns in the data
-        first_few_cells = []
-        for i in range(min(5, len(df))):
-            for j in range(min(5, len(df.columns))):
-                cell_value = str(df.iloc[i, j]).lower()
-                first_few_cells.append(cell_value)
-        
-        cell_text = ' '.join(first_few_cells)
+        # Check for specific pivot table patterns in the data; the top-left 5x5 block is
+        # stringified in one call and joined row by row
+        cell_text = ' '.join(df.iloc[:5, :5].to_numpy(dtype=str).ravel()).lower()
         pivot_indicators = ['column labels', 'row labels', 'count of', 'sum of', 'grand total']
         
         for indicator in pivot_indicators:
@@ -116,16 +233,9 @@ class ExcelProcessor:
         # If we have good columns and actual data, it's probably not a pivot table
         return False
     
-    def _score_sheet(self, df: pd.DataFrame) -> int:
-        """Score a sheet based on how many required columns it has"""
-        score = 0
-        df_columns = [str(col).strip() for col in df.columns]
-        
-        for required_col in Config.REQUIRED_COLUMNS:
-            if required_col in df_columns:
-                score += 1
-        
-        return score
+    def _score_sheet(self, col_set: FrozenSet[str]) -> int:
+        """Score a sheet by how many required columns its normalized header set contains"""
+        return len(Config.REQUIRED_COLUMNS_FROZEN & col_set)
     
     def load_file(self, file_path: str) -> bool:
         """Load Excel file and find the correct sheet with data"""
@@ -156,12 +266,8 @@ class ExcelProcessor:
             self.logger.info(f"Found {len(self.raw_data.columns)} columns in selected sheet")
             
             # Check which required columns are missing
-            missing_columns = []
-            available_columns = list(self.raw_data.columns)
-            
-            for required_col in Config.REQUIRED_COLUMNS:
-                if required_col not in available_columns:
-                    missing_columns.append(required_col)
+            available_columns = set(self.raw_data.columns)
+            missing_columns = [col for col in Config.REQUIRED_COLUMNS if col not in available_columns]
             
             if missing_columns:
                 self.logger.warning(f"Missing optional columns: {missing_columns}")
@@ -192,8 +298,22 @@ class ExcelProcessor:
             self.logger.info(f"Looking for statuses: {Config.TARGET_STATUSES}")
             
             # Filter for required statuses
-            status_filter = self.raw_data['ERF Sched Line Status'].isin(Config.TARGET_STATUSES)
-            self.filtered_data = self.raw_data[status_filter].copy()
+            status = self.raw_data['ERF Sched Line Status']
+            if isinstance(status.dtype, pd.CategoricalDtype):
+                # Map the targets to category codes once, then compare plain ints per row
+                target_codes = [code for code, category in enumerate(status.cat.categories)
+                                if category in Config.TARGET_STATUSES_FROZEN]
+                status_filter = np.isin(status.cat.codes.to_numpy(), target_codes)
+            else:
+                status_filter = status.isin(Config.TARGET_STATUSES_FROZEN)
+            # Boolean indexing already yields a new frame, so no extra .copy()
+            filtered = self.raw_data[status_filter]
+            
+            # Drop categories the filter removed so counts and group-bys only see real values
+            category_cols = filtered.select_dtypes('category').columns
+            self.filtered_data = filtered.assign(**{
+                col: filtered[col].cat.remove_unused_categories() for col in category_cols
+            })
             
             self.logger.info(f"Filtered to {len(self.filtered_data)} items with target statuses")
             
@@ -221,21 +341,30 @@ class ExcelProcessor:
                 self.logger.error("Cannot group: 'Entered by' column not found")
                 return False
             
-            # Remove rows where 'Entered by' is empty/null
-            clean_data = self.filtered_data.dropna(subset=['Entered by'])
-            clean_data = clean_data[clean_data['Entered by'].str.strip() != '']
+            # Remove rows where 'Entered by' is empty/null: one mask, one indexing pass
+            # (on a categorical column .str.strip() only strips the categories)
+            requester = self.filtered_data['Entered by']
+            mask = requester.notna() & (requester.str.strip() != '')
+            clean_data = self.filtered_data.loc[mask]
             
             if len(clean_data) == 0:
                 self.logger.error("No valid 'Entered by' entries found")
                 return False
             
-            self.grouped_data = clean_data.groupby('Entered by')
+            # Group on categorical codes (the column is normally read as a categorical already);
+            # observed=True: only requesters that actually have rows become groups, and
+            # sort=False keeps first-appearance order instead of sorting the keys
+            if not isinstance(clean_data['Entered by'].dtype, pd.CategoricalDtype):
+                clean_data = clean_data.astype({'Entered by': 'category'})
+            self.grouped_data = clean_data.groupby('Entered by', observed=True, sort=False)
+            self._grouped_source = clean_data
             
-            requesters = list(self.grouped_data.groups.keys())
+            group_indices = self.grouped_data.indices
+            requesters = list(group_indices)
             self.logger.info(f"Found {len(requesters)} unique requesters")
             
             for requester in requesters[:10]:  # Show first 10
-                count = len(self.grouped_data.get_group(requester))
+                count = len(group_indices[requester])
                 self.logger.info(f"  - {requester}: {count} items")
             
             if len(requesters) > 10:
@@ -247,12 +376,37 @@ class ExcelProcessor:
             self.logger.error(f"Error grouping data: {str(e)}")
             return False
     
-    def get_grouped_data(self) -> Dict[str, pd.DataFrame]:
-        """Return grouped data as dictionary"""
+    def get_grouped_data(self) -> Mapping:
+        """Return grouped data as a read-only mapping; each group is built when it's accessed"""
         if self.grouped_data is None:
             return {}
         
-        return {name: group for name, group in self.grouped_data}
+        # Reuses the group row positions groupby already computed instead of copying every group
+        # up front; groups are handed over with plain string columns since the email/chart code
+        # fills NaNs with new values
+        return _LazyGroupDict(self._grouped_source, self.grouped_data.indices, self._decategorize)
+    
+    def get_grouped_arrays(self, columns: List[str]) -> Mapping:
+        """Return each group as {column: object array} for the given columns (those present)
+        
+        Column selection, NaN filling ('N/A') and conversion happen once for all groups, so a
+        group costs one take per column instead of a DataFrame of its own.
+        """
+        if self.grouped_data is None:
+            return {}
+        
+        present_columns = set(self._grouped_source.columns)
+        table = self._decategorize(self._grouped_source[[col for col in columns if col in present_columns]])
+        table = table.fillna('N/A')
+        arrays = {col: table[col].to_numpy(dtype=object) for col in table.columns}
+        return _LazyGroupArrays(arrays, self.grouped_data.indices)
+    
+    def _decategorize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Convert categorical columns back to the dtype of their categories"""
+        category_cols = df.select_dtypes('category').columns
+        if len(category_cols) == 0:
+            return df
+        return df.astype({col: df[col].cat.categories.dtype for col in category_cols})
     
     def get_summary(self) -> Dict[str, Any]:
         """Get processing summary"""
@@ -260,11 +414,31 @@ class ExcelProcessor:
             'selected_sheet': self.selected_sheet,
             'total_rows': len(self.raw_data) if self.raw_data is not None else 0,
             'filtered_rows': len(self.filtered_data) if self.filtered_data is not None else 0,
-            'unique_requesters': len(self.grouped_data.groups) if self.grouped_data is not None else 0,
+            'unique_requesters': self.grouped_data.ngroups if self.grouped_data is not None else 0,
             'status_breakdown': {}
         }
         
         if self.filtered_data is not None and 'ERF Sched Line Status' in self.filtered_data.columns:
-            summary['status_breakdown'] = self.filtered_data['ERF Sched Line Status'].value_counts().to_dict()
+            summary['status_breakdown'] = self._status_breakdown(self.filtered_data)
+        
+        return summary
+    
+    def _status_breakdown(self, df: pd.DataFrame) -> Dict[str, int]:
+        """Count rows per status, most common first; memoized per filtered frame"""
+        # Holding the frame itself (not its id) means a new frame can never hit a stale entry
+        if self._status_breakdown_cache is not None and self._status_breakdown_cache[0] is df:
+            return dict(self._status_breakdown_cache[1])
+        
+        status = df['ERF Sched Line Status']
+        if isinstance(status.dtype, pd.CategoricalDtype):
+            # One C-level histogram over the category codes (-1 marks NaN and is skipped)
+            codes = status.cat.codes.to_numpy()
+            counts = np.bincount(codes[codes >= 0], minlength=len(status.cat.categories))
+            order = np.argsort(-counts, kind='stable')
+            categories = status.cat.categories
+            breakdown = {categories[i]: int(counts[i]) for i in order if counts[i] > 0}
+        else:
+            breakdown = status.value_counts().to_dict()
         
-        return summary
\ No newline at end of file
+        self._status_breakdown_cache = (df, breakdown)
+        return dict(breakdown)
\ No newline at end of file
@@ -1,13 +1,107 @@
 # src/email/email_service.py
 """Email service with hardcoded email resolver"""
+import pythoncom
 import win32com.client
+import io
 import json
+import numpy as np
 import os
+import re
+from collections.abc import Iterable, Sized
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
 from typing import Dict, List, Tuple, Optional
 from src.utils.logger import setup_logger
 from src.utils.email_resolver import EmailResolver
 from config.settings import Config
 
+# Inputs matching this are used as-is by search_contact_email (rejects 'a@b', 'a.b@', ...)
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+# Static wrapper around every HTML email body, built once at import
+_HTML_HEADER = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <style>
+        body { 
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
+            line-height: 1.6; 
+            color: #333; 
+            max-width: 800px;
+            margin: 0 auto;
+            padding: 20px;
+        }
+        .header { 
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            padding: 20px;
+            border-radius: 10px;
+            margin-bottom: 20px;
+        }
+        .summary { 
+            background-color: #f8f9fa; 
+            padding: 20px; 
+            border-radius: 8px; 
+            margin: 20px 0;
+            border-left: 5px solid #4CAF50;
+        }
+        .poc-notice {
+            background: #fff3cd;
+            border: 1px solid #ffeaa7;
+            border-radius: 5px;
+            padding: 15px;
+            margin: 20px 0;
+            border-left: 5px solid #f39c12;
+        }
+        .footer { 
+            margin-top: 40px; 
+            font-size: 12px; 
+            color: #666;
+            border-top: 1px solid #ddd; 
+            padding-top: 15px;
+        }
+        table { 
+            border-collapse: collapse; 
+            width: 100%; 
+            margin: 20px 0; 
+        }
+        th, td { 
+            border: 1px solid #ddd; 
+            padding: 8px; 
+            text-align: left; 
+        }
+        th { 
+            background-color: #4CAF50; 
+            color: white; 
+            font-weight: bold; 
+        }
+        tr:nth-child(even) { 
+            background-color: #f9f9f9; 
+        }
+    </style>
+</head>
+<body>
+"""
+
+_HTML_FOOTER = """
+</body>
+</html>
+"""
+
+# Line prefixes with fixed markup in _convert_to_html, keyed by first character so each line
+# is tested against one or two prefixes instead of the whole list
+_PREFIX_HANDLERS = {
+    'S': (('SUMMARY:', lambda line: '<div class="summary"><h3>Summary</h3>\n'),),
+    'I': (
+        ('IMPORTANT NOTICE:', lambda line: '<div class="poc-notice"><h3>Important Notice</h3>\n'),
+        ('If you have any questions', lambda line: '</div><div class="section"><p>' + line + '</p>\n'),
+    ),
+    '•': (('• ', lambda line: f'<p>• {line[2:]}</p>\n'),),
+    'H': (('Hello ', lambda line: f'<div class="header"><h2>{line}</h2></div>\n'),),
+}
+
 class OutlookEmailService:
     """Handles email operations via Outlook with hardcoded email mapping"""
     
@@ -16,10 +110,19 @@ class OutlookEmailService:
         self.outlook = None
         self.is_connected = False
         self.address_book = None
+        # Lowercased GAL name -> SMTP address, in GAL order; built on the first GAL lookup
+        self._gal_index = None
+        # The same index as parallel NumPy arrays for vectorized substring search
+        self._gal_names_arr = None
+        self._gal_emails_arr = None
         
         # Initialize email resolver (uses hardcoded path)
         self.email_resolver = EmailResolver()
         
+        # Resolution results by lowercased name: (email or None, stats key)
+        self._resolve_cache = {}
+        self._resolve_cache_mappings = 0
+        
         # Statistics
         self.resolution_stats = {
             'mapped': 0,
@@ -32,6 +135,7 @@ class OutlookEmailService:
         """Connect to Outlook application"""
         try:
             self.outlook = win32com.client.Dispatch("Outlook.Application")
+            self._gal_index = None
             try:
                 self.address_book = self.outlook.Session.AddressLists.Item("Global Address List")
                 self.logger.info("Successfully connected to Outlook and Global Address List")
@@ -39,6 +143,8 @@ class OutlookEmailService:
                 self.logger.warning("Connected to Outlook but couldn't access Global Address List")
             
             self.is_connected = True
+            # Earlier lookups ran without the GAL, so their misses no longer hold
+            self._resolve_cache.clear()
             return True
         except Exception as e:
             self.logger.error(f"Error connecting to Outlook: {str(e)}")
@@ -51,52 +157,120 @@ class OutlookEmailService:
             return None
         
         # If it's already an email, return it
-        if '@' in name_or_email and '.' in name_or_email:
+        if _EMAIL_RE.match(name_or_email):
             self.logger.info(f"'{name_or_email}' is already an email address")
             return name_or_email
         
+        # Names recur across a batch (to + cc); repeat lookups skip the mapping scan and GAL walk.
+        # Manual mappings added since the last lookup invalidate the cache.
+        key = name_or_email.lower().strip()
+        if self._resolve_cache_mappings != len(self.email_resolver.email_mapping):
+            self._resolve_cache.clear()
+            self._resolve_cache_mappings = len(self.email_resolver.email_mapping)
+        if key in self._resolve_cache:
+            email, stat = self._resolve_cache[key]
+            self.resolution_stats[stat] += 1
+            return email
+        
+        email, stat = self._resolve_uncached(name_or_email)
+        self._resolve_cache[key] = (email, stat)
+        self.resolution_stats[stat] += 1
+        return email
+    
+    def _resolve_uncached(self, name_or_email: str) -> Tuple[Optional[str], str]:
+        """Resolve a name through the mapping file, then Outlook; returns (email, stats key)"""
         # Step 1: Try mapping file resolution
         mapped_email = self.email_resolver.resolve_email(name_or_email)
         if mapped_email:
-            self.resolution_stats['mapped'] += 1
             self.logger.info(f"✅ Mapped resolution: '{name_or_email}' -> '{mapped_email}'")
-            return mapped_email
+            return mapped_email, 'mapped'
         
         # Step 2: Try Outlook Global Address List search
         if self.is_connected and Config.SEARCH_OUTLOOK_CONTACTS and self.address_book:
             try:
-                entries = self.address_book.AddressEntries
-                for entry in entries:
-                    if name_or_email.lower() in entry.Name.lower():
-                        email = entry.GetExchangeUser().PrimarySmtpAddress
-                        self.resolution_stats['outlook_resolved'] += 1
-                        self.logger.info(f"📧 Outlook resolution: '{name_or_email}' -> '{email}'")
-                        return email
+                self._get_gal_index()
+                
+                # One C-level substring scan over every GAL name; the first hit in GAL order wins
+                hits = np.flatnonzero(np.char.find(self._gal_names_arr, name_or_email.lower()) >= 0)
+                if hits.size:
+                    email = str(self._gal_emails_arr[hits[0]])
+                    self.logger.info(f"📧 Outlook resolution: '{name_or_email}' -> '{email}'")
+                    return email, 'outlook_resolved'
             except Exception as e:
                 self.logger.warning(f"Error searching Outlook GAL for '{name_or_email}': {e}")
         
         # Step 3: No resolution found - record as failed
-        self.resolution_stats['failed'] += 1
         self.logger.warning(f"❌ No email resolution found for: '{name_or_email}'")
-        return None
+        return None, 'failed'
+    
+    def _get_gal_index(self) -> Dict[str, str]:
+        """Walk the Global Address List once and keep name -> SMTP address in memory
+        
+        Every COM attribute read is a round trip to Outlook, so the walk happens on the first
+        GAL lookup only; later lookups are plain dictionary scans.
+        """
+        if self._gal_index is None:
+            gal_index = {}
+            for entry in self.address_book.AddressEntries:
+                try:
+                    exchange_user = entry.GetExchangeUser()
+                    if exchange_user and exchange_user.PrimarySmtpAddress:
+                        gal_index.setdefault(entry.Name.lower(), exchange_user.PrimarySmtpAddress)
+                except Exception:
+                    continue
+            
+            self._gal_index = gal_index
+            self._gal_names_arr = np.array(list(gal_index.keys()), dtype=str)
+            self._gal_emails_arr = np.array(list(gal_index.values()), dtype=str)
+            self.logger.info(f"Loaded {len(gal_index)} Global Address List entries")
+        return self._gal_index
     
     def send_email(self, to_address: str, subject: str, body: str, 
                    cc_addresses: List[str] = None, attachments: List[str] = None, 
-                   is_html: bool = True) -> bool:
-        """Send email via Outlook with mapping resolution"""
+                   is_html: bool = True, recipient_map: Dict[str, Optional[str]] = None) -> bool:
+        """Send email via Outlook with mapping resolution (recipient_map holds names resolved up front)"""
         if not self.is_connected:
             self.logger.error("Not connected to Outlook. Call connect() first.")
             return False
         
         try:
-            # Resolve email address using mapping
-            resolved_email = self.search_contact_email(to_address)
-            if not resolved_email:
-                self.logger.error(f"Could not resolve email for: {to_address}")
-                return False
-            
+            recipients = self._resolve_recipients(to_address, cc_addresses, recipient_map)
+        except Exception as e:
+            self.logger.error(f"Error sending email to {to_address}: {str(e)}")
+            return False
+        
+        if recipients is None:
+            return False
+        
+        resolved_email, cc_emails = recipients
+        return self._send_resolved(self.outlook, to_address, resolved_email, subject, body,
+                                   cc_emails, attachments, is_html)
+    
+    def _resolve_recipients(self, to_address: str, cc_addresses: List[str] = None,
+                            recipient_map: Dict[str, Optional[str]] = None) -> Optional[Tuple[str, List[str]]]:
+        """Resolve the To and CC names; None when the To address can't be resolved"""
+        recipient_map = recipient_map or {}
+        
+        # Resolve email address using mapping
+        resolved_email = recipient_map[to_address] if to_address in recipient_map else self.search_contact_email(to_address)
+        if not resolved_email:
+            self.logger.error(f"Could not resolve email for: {to_address}")
+            return None
+        
+        cc_emails = []
+        for cc_addr in cc_addresses or []:
+            cc_email = recipient_map[cc_addr] if cc_addr in recipient_map else self.search_contact_email(cc_addr)
+            if cc_email:
+                cc_emails.append(cc_email)
+        
+        return resolved_email, cc_emails
+    
+    def _send_resolved(self, outlook, to_address: str, resolved_email: str, subject: str, body: str,
+                       cc_emails: List[str], attachments: List[str] = None, is_html: bool = True) -> bool:
+        """Build and send one mail item through the given Outlook handle"""
+        try:
             # Create mail item
-            mail = self.outlook.CreateItem(0)  # 0 = Mail item
+            mail = outlook.CreateItem(0)  # 0 = Mail item
             
             # Set email properties
             mail.To = resolved_email
@@ -109,15 +283,8 @@ class OutlookEmailService:
                 mail.Body = body
             
             # Add CC if provided
-            if cc_addresses:
-                cc_emails = []
-                for cc_addr in cc_addresses:
-                    cc_email = self.search_contact_email(cc_addr)
-                    if cc_email:
-                        cc_emails.append(cc_email)
-                
-                if cc_emails:
-                    mail.CC = "; ".join(cc_emails)
+            if cc_emails:
+                mail.CC = "; ".join(cc_emails)
             
             # Add attachments if provided
             if attachments:
@@ -148,121 +315,80 @@ class OutlookEmailService:
             self.logger.error(f"Error sending email to {to_address}: {str(e)}")
             return False
     
+    def _send_batch(self, outlook, jobs: List[Tuple]) -> List[bool]:
+        """Send already-resolved jobs of (email_info, resolved_email, cc_emails) through one Outlook handle"""
+        return [
+            self._send_resolved(outlook, email_info['to'], resolved_email, email_info['subject'],
+                                email_info['body'], cc_emails, email_info.get('attachments', []), is_html=True)
+            for email_info, resolved_email, cc_emails in jobs
+        ]
+    
+    def _send_batch_in_thread(self, jobs: List[Tuple]) -> List[bool]:
+        """Send a batch on a worker thread with its own COM apartment and Outlook handle"""
+        pythoncom.CoInitialize()
+        try:
+            # COM objects can't be shared across apartments, so each worker dispatches its own
+            outlook = win32com.client.Dispatch("Outlook.Application")
+            try:
+                return self._send_batch(outlook, jobs)
+            finally:
+                del outlook
+        finally:
+            pythoncom.CoUninitialize()
+    
     def _convert_to_html(self, body: str) -> str:
         """Convert plain text with HTML elements to proper HTML email"""
+        # Bodies that are already complete HTML documents go out untouched
+        if body.lstrip()[:9].lower().startswith(('<!doctype', '<html')):
+            return body
         
-        html_email = """
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <style>
-        body { 
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
-            line-height: 1.6; 
-            color: #333; 
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 20px;
-        }
-        .header { 
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 20px;
-            border-radius: 10px;
-            margin-bottom: 20px;
-        }
-        .summary { 
-            background-color: #f8f9fa; 
-            padding: 20px; 
-            border-radius: 8px; 
-            margin: 20px 0;
-            border-left: 5px solid #4CAF50;
-        }
-        .poc-notice {
-            background: #fff3cd;
-            border: 1px solid #ffeaa7;
-            border-radius: 5px;
-            padding: 15px;
-            margin: 20px 0;
-            border-left: 5px solid #f39c12;
-        }
-        .footer { 
-            margin-top: 40px; 
-            font-size: 12px; 
-            color: #666;
-            border-top: 1px solid #ddd; 
-            padding-top: 15px;
-        }
-        table { 
-            border-collapse: collapse; 
-            width: 100%; 
-            margin: 20px 0; 
-        }
-        th, td { 
-            border: 1px solid #ddd; 
-            padding: 8px; 
-            text-align: left; 
-        }
-        th { 
-            background-color: #4CAF50; 
-            color: white; 
-            font-weight: bold; 
-        }
-        tr:nth-child(even) { 
-            background-color: #f9f9f9; 
-        }
-    </style>
-</head>
-<body>
-"""
-        
-        lines = body.split('\n')
+        # Write into one C-backed buffer; the bound write skips the attribute lookup per line
+        buf = io.StringIO()
+        write = buf.write
+        write(_HTML_HEADER)
         in_table = False
         
-        for line in lines:
+        for line in body.split('\n'):
             line = line.strip()
             
             # Handle HTML table
             if line.startswith('<table'):
                 in_table = True
-                html_email += line + '\n'
+                write(line + '\n')
             elif line.endswith('</table>') or line.startswith('</table>'):
-                html_email += line + '\n'
+                write(line + '\n')
                 in_table = False
             elif in_table:
-                html_email += line + '\n'
-            # Handle special sections
-            elif line.startswith('SUMMARY:'):
-                html_email += '<div class="summary"><h3>Summary</h3>\n'
-            elif line.startswith('IMPORTANT NOTICE:'):
-                html_email += '<div class="poc-notice"><h3>Important Notice</h3>\n'
-            elif line.startswith('• '):
-                html_email += f'<p>• {line[2:]}</p>\n'
-            elif line.startswith('If you have any questions'):
-                html_email += '</div><div class="section"><p>' + line + '</p>\n'
-            # Handle regular text
-            elif line and not line.startswith('<'):
-                if line.startswith('Hello '):
-                    html_email += f'<div class="header"><h2>{line}</h2></div>\n'
-                elif 'Proto4Lab Team' in line:
-                    html_email += f'</div><div class="footer"><p><strong>{line}</strong></p>\n'
-                elif line.startswith('---'):
-                    continue
-                elif 'automated email generated' in line:
-                    html_email += f'<p><em>{line}</em></p></div>\n'
+                write(line + '\n')
+            # Blank lines and stray markup outside tables are dropped
+            elif not line or line[0] == '<':
+                continue
+            else:
+                # Handle special sections: only the prefixes sharing the line's first character are tried
+                for prefix, handler in _PREFIX_HANDLERS.get(line[0], ()):
+                    if line.startswith(prefix):
+                        write(handler(line))
+                        break
+                # Handle regular text
                 else:
-                    html_email += f'<p>{line}</p>\n'
-        
-        html_email += """
-</body>
-</html>
-"""
+                    if 'Proto4Lab Team' in line:
+                        write(f'</div><div class="footer"><p><strong>{line}</strong></p>\n')
+                    elif line.startswith('---'):
+                        continue
+                    elif 'automated email generated' in line:
+                        write(f'<p><em>{line}</em></p></div>\n')
+                    else:
+                        write(f'<p>{line}</p>\n')
         
-        return html_email
+        write(_HTML_FOOTER)
+        return buf.getvalue()
     
-    def send_bulk_emails(self, email_data: List[Dict]) -> Tuple[int, int]:
-        """Send multiple emails with resolution statistics"""
+    def send_bulk_emails(self, email_data: Iterable[Dict]) -> Tuple[int, int]:
+        """Send multiple emails with resolution statistics
+        
+        email_data may be a list or a lazy iterable; it is consumed in chunks of
+        Config.EMAIL_SEND_CHUNK_SIZE, so a generator of rendered emails is never held in full.
+        """
         successful = 0
         failed = 0
         
@@ -274,24 +400,28 @@ class OutlookEmailService:
             'failed': 0
         }
         
-        total_emails = len(email_data)
-        self.logger.info(f"Starting bulk email send: {total_emails} emails")
+        if isinstance(email_data, Sized):
+            self.logger.info(f"Starting bulk email send: {len(email_data)} emails")
+        else:
+            self.logger.info("Starting bulk email send (streamed)")
         
-        for i, email_info in enumerate(email_data, 1):
-            
-            success = self.send_email(
-                email_info['to'],
-                email_info['subject'],
-                email_info['body'],
-                email_info.get('cc', []),
-                email_info.get('attachments', []),
-                is_html=True
-            )
+        # Workers dispatch their own Outlook handles, so check the connection once up front
+        if not self.is_connected:
+            self.logger.error("Not connected to Outlook. Call connect() first.")
+            return 0, len(email_data) if isinstance(email_data, Sized) else sum(1 for _ in email_data)
+        
+        # Names resolved so far; shared across chunks so each distinct name is resolved once
+        recipient_map = {}
+        email_iter = iter(email_data)
+        chunk_size = max(Config.EMAIL_SEND_CHUNK_SIZE, 1)
+        while True:
+            chunk = list(islice(email_iter, chunk_size))
+            if not chunk:
+                break
             
-            if success:
-                successful += 1
-            else:
-                failed += 1
+            sent, not_sent = self._send_chunk(chunk, recipient_map)
+            successful += sent
+            failed += not_sent
         
         # Log resolution statistics
         self.logger.info(f"📊 Email Resolution Statistics:")
@@ -302,6 +432,58 @@ class OutlookEmailService:
         
         return successful, failed
     
+    def _send_chunk(self, chunk: List[Dict], recipient_map: Dict[str, Optional[str]]) -> Tuple[int, int]:
+        """Resolve and send one chunk of send_bulk_emails; returns (successful, failed)"""
+        failed = 0
+        
+        # Resolve every recipient here first: the resolver, the statistics and the GAL handle all
+        # belong to this thread, so the send workers only ever get finished addresses.
+        # Each distinct name is resolved once, however many emails it appears on.
+        names = dict.fromkeys(
+            name for email_info in chunk for name in (email_info['to'], *email_info.get('cc', []))
+            if name not in recipient_map
+        )
+        for name in names:
+            try:
+                recipient_map[name] = self.search_contact_email(name)
+            except Exception as e:
+                self.logger.error(f"Error resolving email for {name}: {str(e)}")
+        
+        jobs = []
+        for email_info in chunk:
+            try:
+                recipients = self._resolve_recipients(email_info['to'], email_info.get('cc', []), recipient_map)
+            except Exception as e:
+                self.logger.error(f"Error sending email to {email_info['to']}: {str(e)}")
+                recipients = None
+            
+            if recipients is None:
+                failed += 1
+            else:
+                jobs.append((email_info, *recipients))
+        
+        # Overlap Outlook/SMTP latency by sending batches from several threads
+        workers = min(max(Config.EMAIL_SEND_WORKERS, 1), len(jobs))
+        if workers > 1:
+            batch_size = -(-len(jobs) // workers)
+            batches = [jobs[start:start + batch_size] for start in range(0, len(jobs), batch_size)]
+            
+            results = []
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(self._send_batch_in_thread, batch): batch for batch in batches}
+                for future in as_completed(futures):
+                    try:
+                        results.extend(future.result())
+                    except Exception as e:
+                        # The worker failed before sending anything (COM setup); send on this thread
+                        self.logger.warning(f"Threaded send failed, sending batch serially: {e}")
+                        results.extend(self._send_batch(self.outlook, futures[future]))
+        else:
+            results = self._send_batch(self.outlook, jobs)
+        
+        successful = sum(results)
+        return successful, failed + len(results) - successful
+    
     def test_email_resolution(self, names: List[str]) -> Dict[str, str]:
         """Test email resolution for a list of names"""
         results = {}
@@ -1,29 +1,23 @@
 # src/email/email_templates.py
 """Email template generation with improved formatting and Expeditor Remarks handling"""
+import functools
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from typing import Dict, Any
+from collections.abc import Mapping
+from typing import Dict, Any, Tuple, Union
 
-class EmailTemplate:
-    """Handles email template generation"""
-    
-    @staticmethod
-    def generate_status_email(requester_name: str, items_df: pd.DataFrame) -> Dict[str, str]:
-        """Generate email subject and body for status update"""
-        
-        # Count items by status
-        on_order_count = len(items_df[items_df['ERF Sched Line Status'] == 'On order'])
-        received_count = len(items_df[items_df['ERF Sched Line Status'] == 'Received'])
-        total_items = len(items_df)
-        
-        # Generate subject
-        subject = f"ERF Status Update - {total_items} Items"
-        
-        # Generate HTML table with all required columns including Expeditor Remarks
-        html_table = EmailTemplate._generate_html_table(items_df)
-        
-        # Generate body
-        body = f"""Hello {requester_name},
+# Cell styles and truncation lengths for the items table, by column kind
+_CELL_STYLE_REMARKS = 'padding: 6px; border: 1px solid #ddd; text-align: left; word-wrap: break-word; white-space: normal; max-width: 200px;'
+_CELL_STYLE_SHORT = 'padding: 6px; border: 1px solid #ddd; text-align: center;'
+_CELL_STYLE_REGULAR = 'padding: 6px; border: 1px solid #ddd; text-align: left;'
+_SHORT_COLUMNS = frozenset({'ERF Nr', 'ERF Itm Qty', 'Unit'})
+
+# Cell text is escaped in one C-level str.translate pass so values can't break the markup
+_HTML_ESCAPE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'})
+
+# Plain-text status email body; _convert_to_html turns it into the HTML email
+_BODY_TEMPLATE = """Hello {requester_name},
 
 I hope this email finds you well. This is an automated status update for your ERF items.
 
@@ -48,115 +42,182 @@ Proto4Lab Team
 Lam Research
 
 ---
-This is an automated email generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+This is an automated email generated on {generated_at}
 """
+
+# Table columns in display order, including Expeditor Remarks
+DISPLAY_COLUMNS = [
+    'ERF Nr', 'Material', 'Material Description', 'ERF Itm Qty', 'Unit',
+    'ERF Sched Line Status', 'END', 'PO Due Date', 'Expeditor', 
+    'Expeditor Status', 'Expeditor Remarks'
+]
+
+# Column name mapping for display purposes only
+_COLUMN_DISPLAY_NAMES = {
+    'ERF Nr': 'ERF Nr',
+    'Material': 'Material',
+    'Material Description': 'Material Description',
+    'ERF Itm Qty': 'ERF Itm Qty',
+    'Unit': 'Unit',
+    'END': 'END',
+    'ERF Sched Line Status': 'ERF Sched Line Status', 
+    'Expeditor': 'Expeditor',
+    'Expeditor Status': 'Expeditor Status',
+    'PO Due Date': 'Commit Date',  
+    'Expeditor Remarks': 'Expeditor Remarks',
+}
+
+@functools.lru_cache(maxsize=None)
+def _table_head(columns: Tuple[str, ...]) -> str:
+    """Return the table opening and header row for the given display columns"""
+    parts = ["""
+<table border="1" cellpadding="8" cellspacing="0" style="border-collapse: collapse; font-family: Arial, sans-serif; font-size: 12px; width: 100%; table-layout: fixed;">
+    <thead>
+        <tr style="background-color: #4CAF50; color: white; font-weight: bold;">
+"""]
+    
+    # Add headers with specific column widths using display names
+    for col in columns:
+        display_name = _COLUMN_DISPLAY_NAMES.get(col, col)
+        
+        # Give Expeditor Remarks more width
+        if col == 'Expeditor Remarks':
+            width_style = 'width: 200px;'
+        elif col in ['ERF Nr', 'Unit', 'ERF Itm Qty']:
+            width_style = 'width: 80px;'
+        elif col in ['Material', 'Material Description']:
+            width_style = 'width: 150px;'
+        else:
+            width_style = 'width: 120px;'
+        
+        parts.append(f'            <th style="text-align: left; padding: 8px; border: 1px solid #ddd; {width_style}">{display_name}</th>\n')
+    
+    parts.append("""        </tr>
+    </thead>
+    <tbody>
+""")
+    return "".join(parts)
+
+@functools.lru_cache(maxsize=None)
+def _row_renderer(cell_styles: Tuple[str, ...]):
+    """Compile a function rendering one table row for the given cell styles
+    
+    The styles are baked into a single f-string, so rendering a row is one call with no
+    per-column lookups or branches. Compiled once per column layout.
+    """
+    names = [f"v{i}" for i in range(len(cell_styles))]
+    row_template = (
+        '        <tr style="background-color: {row_color};">\n'
+        + "".join(f'            <td style="{style}">{{{name}}}</td>\n' for style, name in zip(cell_styles, names))
+        + '        </tr>\n'
+    )
+    source = f"def render_row({', '.join(['row_color', *names])}):\n    return f{row_template!r}\n"
+    namespace = {}
+    exec(source, namespace)
+    return namespace['render_row']
+
+class EmailTemplate:
+    """Handles email template generation"""
+    
+    @staticmethod
+    def generate_status_email(requester_name: str, items: Union[pd.DataFrame, Mapping]) -> Dict[str, Any]:
+        """Generate email subject and body for status update
+        
+        items is the requester's DataFrame, or a {column: array} mapping such as the groups from
+        ExcelProcessor.get_grouped_arrays(DISPLAY_COLUMNS).
+        """
+        columns, total_items = EmailTemplate._column_arrays(items)
+        
+        # Count items by status with vectorized compares on the status array
+        statuses = columns['ERF Sched Line Status']
+        on_order_count = int(np.count_nonzero(statuses == 'On order'))
+        received_count = int(np.count_nonzero(statuses == 'Received'))
+        
+        # Generate subject
+        subject = f"ERF Status Update - {total_items} Items"
+        
+        # Generate HTML table with all required columns including Expeditor Remarks
+        html_table = EmailTemplate._render_table(columns, total_items)
+        
+        # Generate body
+        body = _BODY_TEMPLATE.format(
+            requester_name=requester_name,
+            on_order_count=on_order_count,
+            received_count=received_count,
+            total_items=total_items,
+            html_table=html_table,
+            generated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )
         
         return {
             'subject': subject,
-            'body': body
+            'body': body,
+            'item_count': total_items
         }
     
     @staticmethod
-    def _generate_html_table(items_df: pd.DataFrame) -> str:
+    def _column_arrays(items: Union[pd.DataFrame, Mapping]) -> Tuple[Dict[str, np.ndarray], int]:
+        """Return ({display column: NaN-filled object array}, row count), in display order"""
+        if isinstance(items, pd.DataFrame):
+            # Filter to only include columns that exist in the dataframe (hashed once, kept in display order)
+            present_columns = set(items.columns)
+            table_data = items[[col for col in DISPLAY_COLUMNS if col in present_columns]].fillna('N/A')
+            return {col: table_data[col].to_numpy(dtype=object) for col in table_data.columns}, len(items)
+        
+        # Already column arrays (filled by the processor)
+        columns = {col: items[col] for col in DISPLAY_COLUMNS if col in items}
+        return columns, len(next(iter(items.values()), ()))
+    
+    @staticmethod
+    def _generate_html_table(items: Union[pd.DataFrame, Mapping]) -> str:
         """Generate an HTML table for the ERF items with better Expeditor Remarks handling"""
+        return EmailTemplate._render_table(*EmailTemplate._column_arrays(items))
+    
+    @staticmethod
+    def _render_table(columns: Dict[str, np.ndarray], n_rows: int) -> str:
+        """Render the items table from display-ordered column arrays"""
+        available_columns = list(columns)
         
-        # Select key columns including Expeditor Remarks
-        display_columns = [
-            'ERF Nr', 'Material', 'Material Description', 'ERF Itm Qty', 'Unit',
-            'ERF Sched Line Status', 'END', 'PO Due Date', 'Expeditor', 
-            'Expeditor Status', 'Expeditor Remarks'
-        ]
+        # Collect fragments in a list and join once at the end; the header only depends on
+        # which columns are present, so its markup is built once per column set
+        parts = [_table_head(tuple(available_columns))]
         
-        # Column name mapping for display purposes only
-        column_display_names = {
-            'ERF Nr': 'ERF Nr',
-            'Material': 'Material',
-            'Material Description': 'Material Description',
-            'ERF Itm Qty': 'ERF Itm Qty',
-            'Unit': 'Unit',
-            'END': 'END',
-            'ERF Sched Line Status': 'ERF Sched Line Status', 
-            'Expeditor': 'Expeditor',
-            'Expeditor Status': 'Expeditor Status',
-            'PO Due Date': 'Commit Date',  
-            'Expeditor Remarks': 'Expeditor Remarks',
-        }
+        statuses = columns.get('ERF Sched Line Status')
         
-        # Filter to only include columns that exist in the dataframe
-        available_columns = [col for col in display_columns if col in items_df.columns]
+        # Each column's cell style and max length are fixed, so look them up once, not per cell:
+        # full expeditor remarks wrap, short columns stay compact and centred
+        cell_styles = [
+            _CELL_STYLE_REMARKS if col == 'Expeditor Remarks' else
+            _CELL_STYLE_SHORT if col in _SHORT_COLUMNS else
+            _CELL_STYLE_REGULAR
+            for col in available_columns
+        ]
+        max_lengths = [
+            150 if col == 'Expeditor Remarks' else 20 if col in _SHORT_COLUMNS else 50
+            for col in available_columns
+        ]
         
-        # Create the table data
-        table_data = items_df[available_columns].fillna('N/A')
+        # Stringify and truncate whole columns up front, so the rows are built from ready text.
+        # Plain str()/slicing per value: a pandas string pass per column costs more than it saves
+        # at requester-group sizes
+        cell_texts = []
+        for col, max_length in zip(available_columns, max_lengths):
+            texts = [str(value) for value in columns[col]]
+            cell_texts.append(np.array([
+                (text if len(text) <= max_length else text[:max_length - 3] + "...").translate(_HTML_ESCAPE)
+                for text in texts
+            ], dtype=object))
         
-        # Start building HTML with improved styling
-        html = """
-<table border="1" cellpadding="8" cellspacing="0" style="border-collapse: collapse; font-family: Arial, sans-serif; font-size: 12px; width: 100%; table-layout: fixed;">
-    <thead>
-        <tr style="background-color: #4CAF50; color: white; font-weight: bold;">
-"""
+        # Row colours: alternating background, overridden by the status colour
+        row_colors = np.where(np.arange(n_rows) % 2 == 0, "#f9f9f9", "#ffffff").astype(object)
+        if statuses is not None:
+            row_colors[statuses == 'On order'] = "#FFF3CD"  # Light yellow
+            row_colors[statuses == 'Received'] = "#D4EDDA"  # Light green
         
-        # Add headers with specific column widths using display names
-        for col in available_columns:
-            display_name = column_display_names.get(col, col)
-            
-            # Give Expeditor Remarks more width
-            if col == 'Expeditor Remarks':
-                width_style = 'width: 200px;'
-            elif col in ['ERF Nr', 'Unit', 'ERF Itm Qty']:
-                width_style = 'width: 80px;'
-            elif col in ['Material', 'Material Description']:
-                width_style = 'width: 150px;'
-            else:
-                width_style = 'width: 120px;'
-                
-            html += f'            <th style="text-align: left; padding: 8px; border: 1px solid #ddd; {width_style}">{display_name}</th>\n'
-        
-        html += """        </tr>
-    </thead>
-    <tbody>
-"""
+        # Add data rows: one call of the row function compiled for this column layout per row
+        parts.extend(map(_row_renderer(tuple(cell_styles)), row_colors, *cell_texts))
         
-        # Add data rows
-        for idx, (_, row) in enumerate(table_data.iterrows()):
-            # Alternate row colors
-            bg_color = "#f9f9f9" if idx % 2 == 0 else "#ffffff"
-            
-            # Color code based on status
-            status = row.get('ERF Sched Line Status', '')
-            if status == 'On order':
-                status_color = "#FFF3CD"  # Light yellow
-            elif status == 'Received':
-                status_color = "#D4EDDA"  # Light green
-            else:
-                status_color = bg_color
-            
-            html += f'        <tr style="background-color: {status_color};">\n'
-            
-            for col in available_columns:
-                value = str(row.get(col, 'N/A'))
-                
-                # Special handling for different columns
-                if col == 'Expeditor Remarks':
-                    # Keep full expeditor remarks with better wrapping
-                    if len(value) > 150:
-                        value = value[:147] + "..."
-                    cell_style = 'padding: 6px; border: 1px solid #ddd; text-align: left; word-wrap: break-word; white-space: normal; max-width: 200px;'
-                elif col in ['ERF Nr', 'ERF Itm Qty', 'Unit']:
-                    # Keep these short columns compact
-                    if len(value) > 20:
-                        value = value[:17] + "..."
-                    cell_style = 'padding: 6px; border: 1px solid #ddd; text-align: center;'
-                else:
-                    # Regular columns
-                    if len(value) > 50:
-                        value = value[:47] + "..."
-                    cell_style = 'padding: 6px; border: 1px solid #ddd; text-align: left;'
-                
-                html += f'            <td style="{cell_style}">{value}</td>\n'
-            
-            html += '        </tr>\n'
-        
-        html += """    </tbody>
+        parts.append("""    </tbody>
 </table>
 
 <p style="font-size: 11px; color: #666; margin-top: 10px;">
@@ -164,6 +225,6 @@ This is an automated email generated on {datetime.now().strftime('%Y-%m-%d %H:%M
 <span style="background-color: #FFF3CD; padding: 2px 4px;">On Order</span>
 <span style="background-color: #D4EDDA; padding: 2px 4px;">Received</span>
 </p>
-"""
+""")
         
-        return html
\ No newline at end of file
+        return "".join(parts)
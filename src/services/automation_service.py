@@ -1,12 +1,14 @@
 # src/services/automation_service.py
 """Main automation service with unmapped user export"""
-import pandas as pd
 import os
+import sys
 from datetime import datetime
-from typing import Dict, List, Any, Tuple
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+from openpyxl import Workbook
 from src.data.excel_processor import ExcelProcessor
 from src.email.email_service import OutlookEmailService
-from src.email.email_templates import EmailTemplate
+from src.email.email_templates import DISPLAY_COLUMNS, EmailTemplate
 from src.utils.logger import setup_logger
 from config.settings import Config
 
@@ -18,6 +20,9 @@ class ERFAutomationService:
         self.excel_processor = ExcelProcessor()
         self.email_service = OutlookEmailService()
         self.email_template = EmailTemplate()
+        # Email data built for the current grouping; preview, demo and send all reuse it
+        self._email_data_cache = None
+        self._email_data_source = None
         
     def initialize(self) -> bool:
         """Initialize all services"""
@@ -38,6 +43,8 @@ class ERFAutomationService:
     def process_excel_file(self, file_path: str) -> bool:
         """Process Excel file and prepare data"""
         self.logger.info(f"Processing Excel file: {file_path}")
+        self._email_data_cache = None
+        self._email_data_source = None
         
         # Load file
         if not self.excel_processor.load_file(file_path):
@@ -55,35 +62,68 @@ class ERFAutomationService:
         return True
     
     def generate_email_data_with_resolution(self) -> List[Dict[str, Any]]:
-        """Generate email data with actual resolved emails"""
-        email_data = []
-        grouped_data = self.excel_processor.get_grouped_data()
-        
-        for requester, items_df in grouped_data.items():
-            # Resolve the actual email
-            resolved_email = self.email_service.search_contact_email(requester)
-            
-            email_content = self.email_template.generate_status_email(requester, items_df)
-            
-            email_data.append({
-                'to': requester,
-                'resolved_email': resolved_email,
-                'subject': email_content['subject'],
-                'body': email_content['body'],
-                'requester_name': requester,
-                'item_count': len(items_df),
-                'email_found': resolved_email is not None
-            })
-        
-        return email_data
+        """Generate email data with actual resolved emails (built once per grouping)"""
+        # grouped_data is replaced whenever the processor regroups, so identity marks a stale cache;
+        # resolved emails also depend on the resolver's mappings and the Outlook address book
+        # (rebound on every connect), so those are part of the key too
+        source = (
+            self.excel_processor.grouped_data,
+            len(self.email_service.email_resolver.email_mapping),
+            self.email_service.address_book
+        )
+        cached = self._email_data_source
+        if (self._email_data_cache is not None and cached is not None and cached[0] is source[0]
+                and cached[1] == source[1] and cached[2] is source[2]):
+            return list(self._email_data_cache)
+        
+        grouped_data = self.excel_processor.get_grouped_arrays(DISPLAY_COLUMNS)
+        resolved_emails = self._resolve_requesters(grouped_data)
+        
+        email_data = [
+            self._build_email_data(requester, grouped_data[requester], resolved_emails[requester])
+            for requester in resolved_emails
+        ]
+        
+        self._email_data_cache = email_data
+        self._email_data_source = source
+        return list(email_data)
+    
+    def _iter_email_data_with_resolution(self, resolved_emails: Dict[str, Optional[str]]) -> Iterator[Dict[str, Any]]:
+        """Yield email data for the given requesters, rendering each body only when it's reached
+        
+        Used by the live send so only a chunk of rendered bodies is held in memory at a time.
+        """
+        grouped_data = self.excel_processor.get_grouped_arrays(DISPLAY_COLUMNS)
+        for requester, resolved_email in resolved_emails.items():
+            yield self._build_email_data(requester, grouped_data[requester], resolved_email)
+    
+    def _resolve_requesters(self, grouped_data: Mapping) -> Dict[str, Optional[str]]:
+        """Resolve every requester's email, in group order"""
+        # Resolved here on the calling thread: the Outlook GAL handle and the resolver statistics
+        # belong to this thread's COM apartment
+        return {requester: self.email_service.search_contact_email(requester) for requester in grouped_data}
+    
+    def _build_email_data(self, requester: str, items: Mapping, resolved_email: Optional[str]) -> Dict[str, Any]:
+        """Render one requester's email from its {column: array} group"""
+        email_content = self.email_template.generate_status_email(requester, items)
+        return {
+            'to': requester,
+            'resolved_email': resolved_email,
+            'subject': email_content['subject'],
+            'body': email_content['body'],
+            'requester_name': requester,
+            'item_count': email_content['item_count'],
+            'email_found': resolved_email is not None
+        }
     
     def preview_emails(self) -> Dict[str, Any]:
         """Generate preview of emails to be sent with resolution info"""
         email_data = self.generate_email_data_with_resolution()
         
         # Test email resolution for preview
-        mapped_count = sum(1 for email in email_data if email['email_found'])
-        unmapped_count = len(email_data) - mapped_count
+        mapped, unmapped_users = self._split_resolved((email['requester_name'], email['resolved_email']) for email in email_data)
+        mapped_count = len(mapped)
+        unmapped_count = len(unmapped_users)
         
         preview = {
             'total_emails': len(email_data),
@@ -104,9 +144,10 @@ class ERFAutomationService:
         
         return preview
     
-    def export_unmapped_users(self, mode: str = "demo") -> str:
-        """Export unmapped users to Excel file"""
-        unmapped_users = self.email_service.email_resolver.get_unmapped_users()
+    def export_unmapped_users(self, mode: str = "demo", unmapped_users: Optional[List[str]] = None) -> str:
+        """Export unmapped users to Excel file (fetched from the resolver unless given)"""
+        if unmapped_users is None:
+            unmapped_users = self.email_service.email_resolver.get_unmapped_users()
         
         if not unmapped_users:
             self.logger.info("No unmapped users to export")
@@ -117,19 +158,22 @@ class ERFAutomationService:
         filename = f"unmapped_users_{mode}_{timestamp}.xlsx"
         
         try:
-            # Create detailed unmapped users report
-            unmapped_data = []
+            # Create detailed unmapped users report; a write-only workbook streams rows
+            # straight to disk without building a DataFrame or per-cell style objects
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet('Sheet1')
+            sheet.append(['Username', 'Status', 'Mode', 'Timestamp', 'Recommended_Action'])
+            exported_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             for user in unmapped_users:
-                unmapped_data.append({
-                    'Username': user,
-                    'Status': 'Email Not Found',
-                    'Mode': mode,
-                    'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    'Recommended_Action': 'Add to email mapping file or verify username'
-                })
+                sheet.append([
+                    user,
+                    'Email Not Found',
+                    mode,
+                    exported_at,
+                    'Add to email mapping file or verify username'
+                ])
             
-            unmapped_df = pd.DataFrame(unmapped_data)
-            unmapped_df.to_excel(filename, index=False)
+            workbook.save(filename)
             
             self.logger.info(f"Exported {len(unmapped_users)} unmapped users to: {filename}")
             return filename
@@ -148,16 +192,19 @@ class ERFAutomationService:
         # Get first 5 unique requesters
         demo_data = email_data[:5]
         
-        print(f"\nMANAGER DEMO MODE WITH EMAIL MAPPING")
-        print("=" * 60)
-        print(f"Found {len(email_data)} total requesters. Showing first 5 for demo:")
-        print()
-        
+        # Build the listing first and write it to the console once
+        lines = [
+            "\nMANAGER DEMO MODE WITH EMAIL MAPPING",
+            "=" * 60,
+            f"Found {len(email_data)} total requesters. Showing first 5 for demo:",
+            ""
+        ]
         for i, email in enumerate(demo_data, 1):
             status = "✅ FOUND" if email['email_found'] else "❌ NOT FOUND"
             resolved = email['resolved_email'] if email['resolved_email'] else "Email not found"
-            print(f"{i}. {email['requester_name']} - {email['item_count']} items")
-            print(f"   Email Resolution: {status} -> {resolved}")
+            lines.append(f"{i}. {email['requester_name']} - {email['item_count']} items")
+            lines.append(f"   Email Resolution: {status} -> {resolved}")
+        sys.stdout.write("\n".join(lines) + "\n")
         
         # Ask for test email addresses
         test_emails = []
@@ -189,48 +236,19 @@ class ERFAutomationService:
             print("Demo cancelled.")
             return 0, 0, {'cancelled': True}
         
-        # Prepare demo emails with actual resolution info
-        demo_email_list = []
+        # Send demo emails; they're generated lazily so send_bulk_emails only holds a chunk of
+        # the (body-sized) demo texts at a time
+        demo_count = len(demo_data) * len(test_emails)
+        print(f"\nSending {demo_count} demo emails...")
         
-        for email_info in demo_data:
-            original_recipient = email_info['requester_name']
-            resolved_email = email_info['resolved_email'] if email_info['resolved_email'] else "Email not found"
-            
-            for test_email in test_emails:
-                demo_subject = f"[DEMO] ERF Status for {original_recipient} - {email_info['item_count']} Items"
-                
-                demo_body = f"""THIS IS A DEMO EMAIL FOR MANAGER PRESENTATION
-============================================================
-
-Email Resolution Demo:
-Original Recipient: {original_recipient}
-Resolved Email: {resolved_email}
-Items: {email_info['item_count']}
-Demo sent to: {test_email}
-
-{email_info['body']}
-
-============================================================
-END OF DEMO EMAIL - Original would go to: {resolved_email}
-"""
-                
-                demo_email_list.append({
-                    'to': test_email,
-                    'subject': demo_subject,
-                    'body': demo_body
-                })
-        
-        print(f"\nSending {len(demo_email_list)} demo emails...")
+        successful, failed = self.email_service.send_bulk_emails(self._iter_demo_emails(demo_data, test_emails))
         
-        # Send demo emails
-        successful, failed = self.email_service.send_bulk_emails(demo_email_list)
-        
-        # Export unmapped users for demo
-        unmapped_file = self.export_unmapped_users("demo")
+        # Export unmapped users for demo; the list is fetched once and reused for the summary
+        unmapped_users = self.email_service.email_resolver.get_unmapped_users()
+        unmapped_file = self.export_unmapped_users("demo", unmapped_users)
         
         # Get resolution stats
         resolution_stats = self.email_service.get_resolution_stats()
-        unmapped_users = self.email_service.email_resolver.get_unmapped_users()
         
         summary = {
             'demo_mode': True,
@@ -247,38 +265,57 @@ END OF DEMO EMAIL - Original would go to: {resolved_email}
         # Show results
         if unmapped_users:
             print(f"\n⚠️  Found {len(unmapped_users)} users with unmapped emails:")
-            for user in unmapped_users[:10]:  # Show first 10
-                print(f"   - {user}")
-            if len(unmapped_users) > 10:
-                print(f"   ... and {len(unmapped_users) - 10} more")
+            sys.stdout.write(self._format_user_list(unmapped_users))
             
             if unmapped_file:
                 print(f"\n📁 Exported unmapped users to: {unmapped_file}")
         
         return successful, failed, summary
     
+    @staticmethod
+    def _iter_demo_emails(demo_data: List[Dict[str, Any]], test_emails: List[str]) -> Iterator[Dict[str, str]]:
+        """Yield one demo email per (requester, test address) with actual resolution info"""
+        for email_info in demo_data:
+            original_recipient = email_info['requester_name']
+            resolved_email = email_info['resolved_email'] if email_info['resolved_email'] else "Email not found"
+            demo_subject = f"[DEMO] ERF Status for {original_recipient} - {email_info['item_count']} Items"
+            
+            # Only the "Demo sent to" line differs per test address; the rest is built once
+            head = f"""THIS IS A DEMO EMAIL FOR MANAGER PRESENTATION
+============================================================
+
+Email Resolution Demo:
+Original Recipient: {original_recipient}
+Resolved Email: {resolved_email}
+Items: {email_info['item_count']}
+Demo sent to: """
+            tail = f"""
+
+{email_info['body']}
+
+============================================================
+END OF DEMO EMAIL - Original would go to: {resolved_email}
+"""
+            
+            for test_email in test_emails:
+                yield {
+                    'to': test_email,
+                    'subject': demo_subject,
+                    'body': "".join((head, test_email, tail))
+                }
+    
     def send_emails(self, test_mode: bool = True) -> Tuple[int, int, Dict[str, Any]]:
         """Send emails with unmapped user tracking"""
-        email_data = self.generate_email_data_with_resolution()
-        
         if test_mode:
             self.logger.info("Running in PREVIEW MODE - emails will not be sent")
+            email_data = self.generate_email_data_with_resolution()
             
             # Show resolution summary
-            mapped_count = sum(1 for email in email_data if email['email_found'])
-            unmapped_count = len(email_data) - mapped_count
-            
-            print(f"\nEmail Resolution Preview:")
-            print(f"   ✅ Successfully resolved: {mapped_count}")
-            print(f"   ❌ Not resolved: {unmapped_count}")
-            
-            if unmapped_count > 0:
-                unmapped_users = [email['requester_name'] for email in email_data if not email['email_found']]
-                print(f"\nUsers with unresolved emails:")
-                for user in unmapped_users[:10]:
-                    print(f"   - {user}")
-                if len(unmapped_users) > 10:
-                    print(f"   ... and {len(unmapped_users) - 10} more")
+            mapped, unmapped_users = self._split_resolved((email['requester_name'], email['resolved_email']) for email in email_data)
+            mapped_count = len(mapped)
+            unmapped_count = len(unmapped_users)
+            self._print_resolution_summary("Email Resolution Preview", "Users with unresolved emails",
+                                           mapped_count, unmapped_users)
             
             return len(email_data), 0, {
                 'test_mode': True, 
@@ -287,50 +324,41 @@ END OF DEMO EMAIL - Original would go to: {resolved_email}
                 'unmapped_count': unmapped_count
             }
         
-        # Live mode
+        # Live mode: only recipients are resolved up front; bodies are rendered as they're sent
+        resolved_emails = self._resolve_requesters(self.excel_processor.get_grouped_data())
+        
         print(f"\n⚠️  FINAL CONFIRMATION")
-        print(f"About to send {len(email_data)} emails to actual recipients")
+        print(f"About to send {len(resolved_emails)} emails to actual recipients")
         
         # Show resolution summary
-        mapped_count = sum(1 for email in email_data if email['email_found'])
-        unmapped_count = len(email_data) - mapped_count
-        
-        print(f"\nEmail Resolution Summary:")
-        print(f"   ✅ Successfully resolved: {mapped_count}")
-        print(f"   ❌ Not resolved: {unmapped_count}")
-        
-        if unmapped_count > 0:
-            unmapped_users = [email['requester_name'] for email in email_data if not email['email_found']]
-            print(f"\nUsers that will NOT receive emails (no email found):")
-            for user in unmapped_users[:10]:
-                print(f"   - {user}")
-            if len(unmapped_users) > 10:
-                print(f"   ... and {len(unmapped_users) - 10} more")
+        sendable, unmapped_requesters = self._split_resolved(resolved_emails.items())
+        mapped_count = len(sendable)
+        unmapped_count = len(unmapped_requesters)
+        self._print_resolution_summary("Email Resolution Summary", "Users that will NOT receive emails (no email found)",
+                                       mapped_count, unmapped_requesters)
         
         final_confirm = input(f"\nProceed to send {mapped_count} emails to resolved addresses? Type 'SEND LIVE' to confirm: ")
         if final_confirm != 'SEND LIVE':
             print("Live email sending cancelled.")
             return 0, 0, {'cancelled': True, 'reason': 'User cancelled'}
         
-        # Filter out emails without resolved addresses
-        sendable_emails = [email for email in email_data if email['email_found']]
+        # Stream only the emails with resolved addresses
+        print(f"\nSending {mapped_count} emails to resolved addresses...")
+        successful, failed = self.email_service.send_bulk_emails(self._iter_email_data_with_resolution(sendable))
         
-        print(f"\nSending {len(sendable_emails)} emails to resolved addresses...")
-        successful, failed = self.email_service.send_bulk_emails(sendable_emails)
-        
-        # Export unmapped users for live mode
-        unmapped_file = self.export_unmapped_users("live")
+        # Export unmapped users for live mode; the list is fetched once and reused for the summary
+        unmapped_users = self.email_service.email_resolver.get_unmapped_users()
+        unmapped_file = self.export_unmapped_users("live", unmapped_users)
         
         # Get final stats
         summary = self.excel_processor.get_summary()
         resolution_stats = self.email_service.get_resolution_stats()
-        unmapped_users = self.email_service.email_resolver.get_unmapped_users()
         
         summary.update({
             'emails_sent': successful,
             'emails_failed': failed,
             'test_mode': False,
-            'total_requesters': len(email_data),
+            'total_requesters': len(resolved_emails),
             'mapped_count': mapped_count,
             'unmapped_count': unmapped_count,
             'resolution_stats': resolution_stats,
@@ -344,6 +372,37 @@ END OF DEMO EMAIL - Original would go to: {resolved_email}
         
         return successful, failed, summary
     
+    @staticmethod
+    def _split_resolved(resolved) -> Tuple[Dict[str, str], List[str]]:
+        """Split (requester, email) pairs into ({requester: email}, unmapped requesters) in one pass"""
+        mapped, unmapped = {}, []
+        for requester, email in resolved:
+            if email is None:
+                unmapped.append(requester)
+            else:
+                mapped[requester] = email
+        return mapped, unmapped
+    
+    @staticmethod
+    def _print_resolution_summary(heading: str, unmapped_heading: str, mapped_count: int, unmapped_users: List[str]):
+        """Print resolved/unresolved counts and the first unresolved users in one console write"""
+        summary = (
+            f"\n{heading}:\n"
+            f"   ✅ Successfully resolved: {mapped_count}\n"
+            f"   ❌ Not resolved: {len(unmapped_users)}\n"
+        )
+        if unmapped_users:
+            summary += f"\n{unmapped_heading}:\n" + ERFAutomationService._format_user_list(unmapped_users)
+        sys.stdout.write(summary)
+    
+    @staticmethod
+    def _format_user_list(users: List[str], limit: int = 10) -> str:
+        """Format the first limit users as an indented list, with a count of the rest"""
+        lines = [f"   - {user}" for user in users[:limit]]
+        if len(users) > limit:
+            lines.append(f"   ... and {len(users) - limit} more")
+        return "\n".join(lines) + "\n"
+    
     def get_processing_summary(self) -> Dict[str, Any]:
         """Get complete processing summary with email mapping info"""
         summary = self.excel_processor.get_summary()
@@ -1,33 +1,130 @@
 # src/utils/chart_generator.py
 """Chart generation utilities for ERF data visualization"""
-import matplotlib.pyplot as plt
+import matplotlib
+# Charts are only ever written to PNG files, so use the non-interactive Agg backend
+matplotlib.use("Agg")
+# Figures are built directly (no pyplot), which keeps the GUI/pyplot machinery out of the import
+from matplotlib.figure import Figure
+from cycler import cycler
 import pandas as pd
-import seaborn as sns
 from datetime import datetime
+import itertools
 import os
-from typing import Dict, List, Tuple
+import pickle
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Tuple, Any
 import numpy as np
+from config.settings import Config
+from src.utils.logger import setup_logger
+
+# Default PNG resolution; callers can ask for more per chart
+CHART_DPI = 150
+
+# seaborn's six-colour "husl" palette, inlined so seaborn isn't needed just to set colours
+_HUSL_PALETTE = ['#f77189', '#bb9832', '#50b131', '#36ada4', '#3ba3ec', '#e866f4']
+
+def _as_category(series: pd.Series) -> pd.Series:
+    """Return a low-cardinality text column as a categorical (counts and compares then run on int codes)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    return series.astype('category')
+
+# Generator reused by the calls a worker process handles (see generate_all_for_requesters)
+_worker_generator = None
+
+def _render_requester_charts(output_dir: str, dpi: int, requester_name: str, items_df: pd.DataFrame) -> List[str]:
+    """Render a requester's three charts in a worker process and return their paths"""
+    global _worker_generator
+    if _worker_generator is None or _worker_generator.output_dir != output_dir:
+        _worker_generator = ERFChartGenerator(output_dir)
+        # Worker generators start their counters at 0 too, so tell their files apart by process
+        _worker_generator._run_stamp += f"_{os.getpid()}"
+    return _worker_generator._generate_requester_charts(requester_name, items_df, dpi)
 
 class ERFChartGenerator:
     """Generates charts for ERF data visualization"""
     
     def __init__(self, output_dir: str = "charts"):
+        self.logger = setup_logger(self.__class__.__name__)
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
         
         # Set matplotlib style
-        plt.style.use('default')
-        sns.set_palette("husl")
+        matplotlib.rcdefaults()  # same reset as style.use('default')
+        matplotlib.rcParams['axes.prop_cycle'] = cycler(color=_HUSL_PALETTE)
+        
+        # Figures are created once per chart kind and cleared between requesters instead of
+        # being allocated and closed per call; constrained layout replaces tight_layout/bbox_inches
+        self._figures: Dict[str, Figure] = {}
+        
+        # Chart filenames get the generator's creation time plus a running counter, so charts
+        # written within the same second never overwrite each other
+        self._run_stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self._counter = itertools.count()
+        
+        # Column aggregates of the last DataFrame charted (see _precompute)
+        self._stats_source = None
+        self._stats: Dict[str, Any] = {}
     
-    def generate_requester_summary_chart(self, requester_name: str, items_df: pd.DataFrame) -> str:
+    def _get_figure(self, name: str, figsize: Tuple[float, float]) -> Figure:
+        """Return the cached figure for a chart kind, cleared and ready to draw on"""
+        fig = self._figures.get(name)
+        if fig is None:
+            fig = Figure(figsize=figsize, layout='constrained')
+            self._figures[name] = fig
+        else:
+            fig.clear()
+        return fig
+    
+    def _chart_stamp(self) -> str:
+        """Return the unique suffix for the next chart filename"""
+        return f"{self._run_stamp}_{next(self._counter)}"
+    
+    def _precompute(self, items_df: pd.DataFrame) -> Dict[str, Any]:
+        """Return the column aggregates the charts share, computed once per DataFrame
+        
+        Callers usually render all three charts for the same requester in a row, so the
+        aggregates of the last DataFrame are kept (weakly referenced, keyed by identity and length).
+        Columns missing from items_df give None.
+        """
+        source = self._stats_source() if self._stats_source is not None else None
+        if source is items_df and self._stats.get('row_count') == len(items_df):
+            return self._stats
+        
+        columns = items_df.columns
+        
+        # Status and material are converted to categoricals once, before any counting
+        statuses = _as_category(items_df['ERF Sched Line Status']) if 'ERF Sched Line Status' in columns else None
+        materials = _as_category(items_df['Material']) if 'Material' in columns else None
+        
+        stats = {
+            'row_count': len(items_df),
+            'statuses': statuses,
+            'status_counts': statuses.value_counts() if statuses is not None else None,
+            # Aligned with items_df (unparseable dates are NaT), so the timeline can pair them with statuses
+            'due_dates': pd.to_datetime(items_df['Due Date'], errors='coerce') if 'Due Date' in columns else None,
+            'qty_numeric': pd.to_numeric(items_df['ERF Itm Qty'], errors='coerce').dropna() if 'ERF Itm Qty' in columns else None,
+            'material_counts': materials.value_counts() if materials is not None else None,
+        }
+        
+        self._stats_source = weakref.ref(items_df)
+        self._stats = stats
+        return stats
+    
+    def generate_requester_summary_chart(self, requester_name: str, items_df: pd.DataFrame, dpi: int = CHART_DPI) -> str:
         """Generate a comprehensive summary chart for a requester"""
         
         # Create figure with subplots
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
+        fig = self._get_figure('summary', (15, 12))
+        ((ax1, ax2), (ax3, ax4)) = fig.subplots(2, 2)
         fig.suptitle(f'ERF Status Summary for {requester_name}', fontsize=16, fontweight='bold')
         
+        stats = self._precompute(items_df)
+        
         # 1. Status Distribution (Pie Chart)
-        status_counts = items_df['ERF Sched Line Status'].value_counts()
+        status_counts = stats['status_counts']
         colors = ['#FF9999', '#66B2FF', '#99FF99', '#FFD700', '#FF6B6B']
         
         ax1.pie(status_counts.values, labels=status_counts.index, autopct='%1.1f%%', 
@@ -35,8 +132,8 @@ class ERFChartGenerator:
         ax1.set_title(f'Status Distribution\n({len(items_df)} Total Items)', fontweight='bold')
         
         # 2. Items by Due Date (Timeline)
-        if 'Due Date' in items_df.columns:
-            due_dates = pd.to_datetime(items_df['Due Date'], errors='coerce').dropna()
+        if stats['due_dates'] is not None:
+            due_dates = stats['due_dates'].dropna()
             if not due_dates.empty:
                 due_dates_grouped = due_dates.dt.to_period('M').value_counts().sort_index()
                 
@@ -56,8 +153,8 @@ class ERFChartGenerator:
                 ax2.set_title('Items by Due Date', fontweight='bold')
         
         # 3. Top Materials (Horizontal Bar Chart)
-        if 'Material' in items_df.columns:
-            material_counts = items_df['Material'].value_counts().head(10)
+        if stats['material_counts'] is not None:
+            material_counts = stats['material_counts'].head(10)
             
             if not material_counts.empty:
                 y_pos = np.arange(len(material_counts))
@@ -73,54 +170,66 @@ class ERFChartGenerator:
                 ax3.set_title('Top Materials', fontweight='bold')
         
         # 4. Quantity Distribution
-        if 'ERF Itm Qty' in items_df.columns:
-            quantities = pd.to_numeric(items_df['ERF Itm Qty'], errors='coerce').dropna()
+        if stats['qty_numeric'] is not None:
+            quantities = stats['qty_numeric']
             
             if not quantities.empty:
-                ax4.hist(quantities, bins=min(20, len(quantities.unique())), 
+                # Bin once with numpy and draw the bars directly (ax.hist would bin again)
+                counts, edges = np.histogram(quantities.to_numpy(), bins=min(20, quantities.nunique()))
+                ax4.bar(edges[:-1], counts, width=np.diff(edges), align='edge',
                         color='lightgreen', alpha=0.7, edgecolor='black')
                 ax4.set_title('Quantity Distribution', fontweight='bold')
                 ax4.set_xlabel('Quantity')
                 ax4.set_ylabel('Frequency')
                 
-                # Add summary stats
-                stats_text = f'Total Qty: {quantities.sum():.0f}\nAvg: {quantities.mean():.1f}\nMax: {quantities.max():.0f}'
+                # Add summary stats (one aggregation call for all three)
+                qty_summary = quantities.agg(['sum', 'mean', 'max'])
+                stats_text = f"Total Qty: {qty_summary['sum']:.0f}\nAvg: {qty_summary['mean']:.1f}\nMax: {qty_summary['max']:.0f}"
                 ax4.text(0.7, 0.8, stats_text, transform=ax4.transAxes, 
                         bbox=dict(boxstyle="round,pad=0.3", facecolor="white", alpha=0.7))
             else:
                 ax4.text(0.5, 0.5, 'No quantity data', ha='center', va='center', transform=ax4.transAxes)
                 ax4.set_title('Quantity Distribution', fontweight='bold')
         
-        # Adjust layout and save
-        plt.tight_layout()
-        
-        # Save chart
-        chart_filename = f"{requester_name}_ERF_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
+        # Save chart (layout is handled by the figure's constrained layout)
+        chart_filename = f"{requester_name}_ERF_summary_{self._chart_stamp()}.png"
         chart_path = os.path.join(self.output_dir, chart_filename)
-        plt.savefig(chart_path, dpi=300, bbox_inches='tight', facecolor='white')
-        plt.close()
+        fig.savefig(chart_path, dpi=dpi, facecolor='white')
         
         return chart_path
     
-    def generate_status_timeline_chart(self, requester_name: str, items_df: pd.DataFrame) -> str:
+    def generate_status_timeline_chart(self, requester_name: str, items_df: pd.DataFrame, dpi: int = CHART_DPI) -> str:
         """Generate a timeline chart showing status progression"""
         
-        fig, ax = plt.subplots(figsize=(12, 6))
+        fig = self._get_figure('timeline', (12, 6))
+        ax = fig.subplots()
         
         # Create timeline data
-        if 'Due Date' in items_df.columns and 'ERF Sched Line Status' in items_df.columns:
-            df_copy = items_df.copy()
-            df_copy['Due Date'] = pd.to_datetime(df_copy['Due Date'], errors='coerce')
-            df_copy = df_copy.dropna(subset=['Due Date'])
+        stats = self._precompute(items_df)
+        if stats['due_dates'] is not None and stats['status_counts'] is not None:
+            # Only the two arrays the timeline needs: months of the parsed dates, and the matching statuses
+            has_date = stats['due_dates'].notna().to_numpy()
+            months = stats['due_dates'].to_numpy()[has_date].astype('datetime64[M]')
+            statuses = stats['statuses'].array[has_date]
             
-            if not df_copy.empty:
-                # Group by month and status
-                df_copy['Month'] = df_copy['Due Date'].dt.to_period('M')
-                timeline_data = df_copy.groupby(['Month', 'ERF Sched Line Status']).size().unstack(fill_value=0)
+            if len(months):
+                # Count items per (month, status) cell: factorize both keys to integer codes and
+                # scatter-add into a small months x statuses matrix (rows with no status are dropped)
+                month_codes, month_labels = pd.factorize(months, sort=True)
+                stat_codes, stat_labels = pd.factorize(statuses, sort=True)
+                has_status = stat_codes >= 0
+                counts = np.zeros((len(month_labels), len(stat_labels)), dtype=np.int32)
+                np.add.at(counts, (month_codes[has_status], stat_codes[has_status]), 1)
                 
-                # Create stacked bar chart
-                timeline_data.plot(kind='bar', stacked=True, ax=ax, 
-                                 color=['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7'])
+                # Create stacked bar chart: each status sits on the running total of the ones before it
+                colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7']
+                x = np.arange(len(month_labels))
+                bottoms = np.cumsum(counts, axis=1) - counts
+                for i, status in enumerate(stat_labels):
+                    ax.bar(x, counts[:, i], bottom=bottoms[:, i], width=0.5,
+                           color=colors[i % len(colors)], label=str(status))
+                ax.set_xticks(x)
+                ax.set_xticklabels([str(month) for month in month_labels])
                 
                 ax.set_title(f'ERF Timeline for {requester_name}', fontsize=14, fontweight='bold')
                 ax.set_xlabel('Month', fontweight='bold')
@@ -133,17 +242,14 @@ class ERFChartGenerator:
                 ax.text(0.5, 0.5, 'No timeline data available', ha='center', va='center', transform=ax.transAxes)
                 ax.set_title(f'ERF Timeline for {requester_name}', fontsize=14, fontweight='bold')
         
-        plt.tight_layout()
-        
         # Save chart
-        chart_filename = f"{requester_name}_timeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
+        chart_filename = f"{requester_name}_timeline_{self._chart_stamp()}.png"
         chart_path = os.path.join(self.output_dir, chart_filename)
-        plt.savefig(chart_path, dpi=300, bbox_inches='tight', facecolor='white')
-        plt.close()
+        fig.savefig(chart_path, dpi=dpi, facecolor='white')
         
         return chart_path
     
-    def generate_summary_table_image(self, requester_name: str, items_df: pd.DataFrame) -> str:
+    def generate_summary_table_image(self, requester_name: str, items_df: pd.DataFrame, dpi: int = CHART_DPI) -> str:
         """Generate a summary table as an image (for key metrics only)"""
         
         # Create summary data
@@ -152,19 +258,23 @@ class ERFChartGenerator:
             'Value': []
         }
         
-        # Calculate metrics
+        # Calculate metrics from the shared aggregates
+        stats = self._precompute(items_df)
         total_items = len(items_df)
-        on_order = len(items_df[items_df['ERF Sched Line Status'] == 'On order'])
-        received = len(items_df[items_df['ERF Sched Line Status'] == 'Received'])
+        status_counts = stats['status_counts']
+        on_order = int(status_counts.get('On order', 0)) if status_counts is not None else 0
+        received = int(status_counts.get('Received', 0)) if status_counts is not None else 0
         
         total_qty = 0
         avg_qty = 0
-        if 'ERF Itm Qty' in items_df.columns:
-            quantities = pd.to_numeric(items_df['ERF Itm Qty'], errors='coerce').dropna()
-            total_qty = quantities.sum() if not quantities.empty else 0
-            avg_qty = quantities.mean() if not quantities.empty else 0
+        if stats['qty_numeric'] is not None:
+            # One reduction over the values; the average is derived from the total
+            quantities = stats['qty_numeric'].to_numpy()
+            if quantities.size:
+                total_qty = quantities.sum()
+                avg_qty = total_qty / quantities.size
         
-        unique_materials = items_df['Material'].nunique() if 'Material' in items_df.columns else 0
+        unique_materials = int(np.count_nonzero(stats['material_counts'].to_numpy())) if stats['material_counts'] is not None else 0
         
         summary_data['Value'] = [
             total_items, on_order, received, f"{total_qty:.0f}", 
@@ -172,7 +282,8 @@ class ERFChartGenerator:
         ]
         
         # Create figure
-        fig, ax = plt.subplots(figsize=(8, 4))
+        fig = self._get_figure('summary_table', (8, 4))
+        ax = fig.subplots()
         ax.axis('tight')
         ax.axis('off')
         
@@ -200,27 +311,73 @@ class ERFChartGenerator:
                 if i % 2 == 0:
                     table[(i, j)].set_facecolor('#f0f0f0')
         
-        plt.title(f'ERF Summary for {requester_name}', fontsize=14, fontweight='bold', pad=20)
+        ax.set_title(f'ERF Summary for {requester_name}', fontsize=14, fontweight='bold', pad=20)
         
         # Save chart
-        chart_filename = f"{requester_name}_summary_table_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
+        chart_filename = f"{requester_name}_summary_table_{self._chart_stamp()}.png"
         chart_path = os.path.join(self.output_dir, chart_filename)
-        plt.savefig(chart_path, dpi=300, bbox_inches='tight', facecolor='white')
-        plt.close()
+        fig.savefig(chart_path, dpi=dpi, facecolor='white')
         
         return chart_path
     
+    def _generate_requester_charts(self, requester_name: str, items_df: pd.DataFrame, dpi: int = CHART_DPI) -> List[str]:
+        """Generate the summary chart, timeline and summary table for one requester"""
+        return [
+            self.generate_requester_summary_chart(requester_name, items_df, dpi),
+            self.generate_status_timeline_chart(requester_name, items_df, dpi),
+            self.generate_summary_table_image(requester_name, items_df, dpi)
+        ]
+    
+    def generate_all_for_requesters(self, jobs: List[Tuple[str, pd.DataFrame]], dpi: int = CHART_DPI) -> Dict[str, List[str]]:
+        """Generate all three charts for each (requester name, items) job; returns requester -> chart paths
+        
+        Rendering is CPU-bound and matplotlib is not thread-safe, so requesters are spread over
+        worker processes. If the pool can't start or a job can't reach a worker, only the jobs
+        that didn't finish are rendered in this process; errors raised while rendering propagate.
+        """
+        results = {}
+        pending = list(jobs)
+        workers = min(max(Config.CHART_WORKERS, 1), len(jobs))
+        if workers > 1:
+            pending = []
+            submitted = []
+            executor = None
+            try:
+                executor = ProcessPoolExecutor(max_workers=workers)
+                for job in jobs:
+                    submitted.append((job, executor.submit(_render_requester_charts, self.output_dir, dpi, *job)))
+            except (BrokenProcessPool, OSError) as e:
+                self.logger.warning(f"Chart worker pool unavailable ({e}); rendering remaining requesters in-process")
+                pending.extend(jobs[len(submitted):])
+            
+            try:
+                for job, future in submitted:
+                    try:
+                        results[job[0]] = future.result()
+                    except (BrokenProcessPool, pickle.PicklingError) as e:
+                        self.logger.warning(f"Chart worker failed for {job[0]} ({e}); rendering it in-process")
+                        pending.append(job)
+            finally:
+                if executor is not None:
+                    executor.shutdown(cancel_futures=True)
+        
+        for requester_name, items_df in pending:
+            results[requester_name] = self._generate_requester_charts(requester_name, items_df, dpi)
+        
+        # Report in job order whichever way each requester was rendered
+        return {requester_name: results[requester_name] for requester_name, _ in jobs}
+    
     def cleanup_old_charts(self, days_old: int = 7):
         """Clean up chart files older than specified days"""
         import time
         
-        current_time = time.time()
-        for filename in os.listdir(self.output_dir):
-            file_path = os.path.join(self.output_dir, filename)
-            if os.path.isfile(file_path):
-                file_age = current_time - os.path.getctime(file_path)
-                if file_age > (days_old * 24 * 60 * 60):  # Convert days to seconds
-                    try:
-                        os.remove(file_path)
-                    except Exception:
-                        pass  # Ignore errors during cleanup
\ No newline at end of file
+        cutoff = time.time() - (days_old * 24 * 60 * 60)  # Convert days to seconds
+        
+        # scandir entries carry the file type, and stat() is cached on the entry
+        with os.scandir(self.output_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_ctime < cutoff:
+                        os.remove(entry.path)
+                except Exception:
+                    pass  # Ignore errors during cleanup
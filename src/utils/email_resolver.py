@@ -1,9 +1,14 @@
 # src/utils/email_resolver.py
 """Fast email resolution utility using simple dictionary lookup"""
+import functools
+import numpy as np
 import pandas as pd
 import os
+from itertools import islice
 from typing import Optional, Dict, List
 from src.utils.logger import setup_logger
+from src.utils.excel_reader import excel_engine_options
+from src.utils.sheet_cache import load_cached_metadata, save_cached_metadata
 
 class EmailResolver:
     """Fast email resolver using preloaded dictionary"""
@@ -13,6 +18,13 @@ class EmailResolver:
         self.email_mapping = {}
         self.unmapped_users = set()  # Use set for faster lookup
         
+        # Index for partial matches (see _partial_match), kept in mapping order and
+        # extended lazily as mappings are added
+        self._index_ids: List[str] = []
+        self._id_positions: Dict[str, int] = {}
+        self._trigram_index: Dict[str, List[int]] = {}
+        self._max_id_len = 0
+        
         # HARDCODED PATH - Update this to your actual email mapping file path
         self.mapping_file_path = r"email_mapping_detailed_20250911_121356.xlsx"
         
@@ -27,10 +39,26 @@ class EmailResolver:
             self._setup_fallback_mode()
             return
         
+        # A CSV export next to the workbook, at least as new as it, is read instead (C parser, no XML)
+        source_path = self.mapping_file_path
+        csv_path = self.mapping_file_path + '.csv'
+        if os.path.exists(csv_path) and os.path.getmtime(csv_path) >= os.path.getmtime(self.mapping_file_path):
+            source_path = csv_path
+        
+        # Reuse the mapping parsed from this exact file version on an earlier run
+        cached_mapping = load_cached_metadata(source_path, 'email_mapping')
+        if cached_mapping is not None:
+            self.email_mapping = cached_mapping
+            self.logger.info(f"Loaded {len(self.email_mapping)} email mappings from cache")
+            return
+        
         try:
-            # Read Excel file once
-            df = pd.read_excel(self.mapping_file_path)
-            self.logger.info(f"Read Excel file with {len(df)} rows and {len(df.columns)} columns")
+            # Read the file once
+            if source_path == csv_path:
+                df = pd.read_csv(source_path, dtype=str)
+            else:
+                df = pd.read_excel(source_path, **excel_engine_options(source_path))
+            self.logger.info(f"Read {os.path.basename(source_path)} with {len(df)} rows and {len(df.columns)} columns")
             
             # Find email column efficiently - look for '@' in column names or data
             email_col = None
@@ -42,13 +70,13 @@ class EmailResolver:
                     email_col = col
                     break
             
-            # If not found in column names, check data (sample first few rows only)
+            # If not found in column names, check data (sample first few rows only): one
+            # vectorized '@' test over the leading rows of every column but the first (Eng ID)
             if not email_col:
-                for col in df.columns[1:]:  # Skip first column (Eng ID)
-                    sample = df[col].dropna().head(3).astype(str)
-                    if any('@' in val for val in sample):
-                        email_col = col
-                        break
+                sample = df.iloc[:20, 1:].to_numpy(dtype=str)
+                has_at = (np.char.find(sample, '@') >= 0).any(axis=0)
+                if has_at.any():
+                    email_col = df.columns[1 + int(has_at.argmax())]
             
             if not email_col:
                 self.logger.error("No email column found")
@@ -71,6 +99,7 @@ class EmailResolver:
             
             # Create dictionary mapping
             self.email_mapping = dict(zip(eng_ids, emails))
+            save_cached_metadata(source_path, 'email_mapping', self.email_mapping)
             
             self.logger.info(f"Loaded {len(self.email_mapping)} email mappings from '{email_col}' column")
             
@@ -107,32 +136,70 @@ class EmailResolver:
         # Direct dictionary lookup (O(1) operation - very fast)
         if clean_username in self.email_mapping:
             email = self.email_mapping[clean_username]
-            self.logger.info(f"Resolved {username} -> {email}")
+            self.logger.debug(f"Resolved {username} -> {email}")
             return email
         
-        # Fast partial matching using dictionary iteration (only if needed)
-        for eng_id, email in self.email_mapping.items():
-            if clean_username in eng_id or eng_id in clean_username:
-                self.logger.info(f"Partial match: {username} -> {email} (via {eng_id})")
-                return email
+        # Partial matching through the substring index (only if needed)
+        eng_id = self._partial_match(clean_username)
+        if eng_id is not None:
+            email = self.email_mapping[eng_id]
+            self.logger.debug(f"Partial match: {username} -> {email} (via {eng_id})")
+            return email
         
         # Add to unmapped set for tracking
         self.unmapped_users.add(username)
         self.logger.warning(f"No email found for: {username}")
         return None
     
+    def _update_partial_index(self):
+        """Index mapped IDs added since the last call (mappings are only ever added, never removed)"""
+        for eng_id in islice(self.email_mapping, len(self._index_ids), None):
+            pos = len(self._index_ids)
+            self._index_ids.append(eng_id)
+            self._id_positions[eng_id] = pos
+            self._max_id_len = max(self._max_id_len, len(eng_id))
+            for trigram in {eng_id[i:i + 3] for i in range(len(eng_id) - 2)}:
+                self._trigram_index.setdefault(trigram, []).append(pos)
+    
+    def _partial_match(self, clean_username: str) -> Optional[str]:
+        """Return the first mapped ID, in mapping order, that contains or is contained in clean_username"""
+        self._update_partial_index()
+        
+        if len(clean_username) < 3:
+            # Too short for the trigram index (rare): scan the mapping
+            return next((eng_id for eng_id in self.email_mapping
+                         if clean_username in eng_id or eng_id in clean_username), None)
+        
+        # IDs containing the username are listed under every trigram of the username,
+        # so only the shortest of those posting lists needs checking (lists are in mapping order)
+        best = None
+        candidates = min((self._trigram_index.get(clean_username[i:i + 3], ())
+                          for i in range(len(clean_username) - 2)), key=len)
+        for pos in candidates:
+            if clean_username in self._index_ids[pos]:
+                best = pos
+                break
+        
+        # IDs contained in the username are among its substrings: look those up directly
+        n = len(clean_username)
+        for start in range(n):
+            for end in range(start + 1, min(n, start + self._max_id_len) + 1):
+                pos = self._id_positions.get(clean_username[start:end])
+                if pos is not None and (best is None or pos < best):
+                    best = pos
+        
+        return self._index_ids[best] if best is not None else None
+    
     def bulk_resolve_emails(self, usernames: List[str]) -> Dict[str, Optional[str]]:
         """Resolve multiple emails at once (more efficient)"""
-        results = {}
-        clean_usernames = [str(u).strip().upper() for u in usernames]
-        
-        # Bulk lookup using dictionary comprehension
-        for original, clean in zip(usernames, clean_usernames):
-            results[original] = self.email_mapping.get(clean)
-            if not results[original]:
-                self.unmapped_users.add(original)
+        # Clean and look up all names in vectorized passes (str() first, as before)
+        names = pd.Series(usernames, dtype=object)
+        clean_usernames = names.map(str).str.strip().str.upper()
+        emails = clean_usernames.map(self.email_mapping).astype(object)
+        found = emails.notna().to_numpy()
         
-        return results
+        self.unmapped_users.update(names[~found].tolist())
+        return dict(zip(usernames, emails.where(found, None).tolist()))
     
     def get_unmapped_users(self) -> List[str]:
         """Get list of unmapped users"""
@@ -180,7 +247,7 @@ class EmailResolver:
             return
         
         try:
-            df = pd.read_excel(manual_file)
+            df = pd.read_excel(manual_file, **excel_engine_options(manual_file))
             if 'Username' in df.columns and 'Email' in df.columns:
                 for _, row in df.iterrows():
                     username = str(row['Username']).strip()
@@ -201,4 +268,13 @@ class EmailResolver:
             'coverage_percentage': 0 if not self.unmapped_users else 
                 round((len(self.email_mapping) / (len(self.email_mapping) + len(self.unmapped_users))) * 100, 1),
             'sample_mappings': dict(list(self.email_mapping.items())[:5])
-        }
\ No newline at end of file
+        }
+
+@functools.lru_cache(maxsize=1)
+def get_email_resolver() -> EmailResolver:
+    """Return the process-wide resolver, loading the mapping file on first use only
+    
+    The resolver is shared, including its unmapped-user tracking; construct EmailResolver()
+    directly where a separate instance is needed.
+    """
+    return EmailResolver()
@@ -0,0 +1,181 @@
+# src/utils/excel_reader.py
+"""Excel reading helpers shared by the processor and the standalone checker scripts"""
+import zipfile
+from xml.etree import ElementTree
+import pandas as pd
+from typing import Any, Dict, List, Optional
+from src.utils.sheet_cache import load_cached_metadata, save_cached_metadata
+
+# Prefer the Rust-based calamine reader; fall back to openpyxl when it isn't installed
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
+
+# openpyxl's read-only mode streams sheet XML instead of loading styles and validation into
+# memory; pandas defaults to it today, spelled out here so the fallback path can't regress
+OPENPYXL_KWARGS = {'read_only': True, 'data_only': True}
+
+# Rows kept per sheet by load_sheet_previews (enough for pivot checks and sample output)
+PREVIEW_ROWS = 5
+
+def excel_engine_options(file_path: str) -> Dict[str, Any]:
+    """Return the engine/engine_kwargs to pass to pd.read_excel or pd.ExcelFile for a workbook"""
+    if EXCEL_ENGINE == 'calamine':
+        return {'engine': 'calamine'}
+    if file_path.lower().endswith('.xls'):
+        # Legacy .xls isn't readable by openpyxl; let pandas pick its reader
+        return {}
+    return {'engine': 'openpyxl', 'engine_kwargs': OPENPYXL_KWARGS}
+
+def read_sheet_rows(excel_file, sheet_name: str, max_rows: int) -> List[tuple]:
+    """Read the first rows of a sheet as raw value tuples without building a DataFrame"""
+    if excel_file.engine == 'calamine':
+        sheet = excel_file.book.get_sheet_by_name(sheet_name)
+        return [tuple(row) for row in sheet.to_python(skip_empty_area=False, nrows=max_rows)]
+    
+    if excel_file.engine == 'openpyxl':
+        # Handles opened with OPENPYXL_KWARGS are read-only, so iter_rows streams the sheet XML
+        worksheet = excel_file.book[sheet_name]
+        return list(worksheet.iter_rows(max_row=max_rows, values_only=True))
+    
+    # Any other reader (xlrd for .xls): let pandas parse just the first rows
+    df = excel_file.parse(sheet_name, header=None, nrows=max_rows)
+    return list(df.itertuples(index=False, name=None))
+
+def read_header_row(excel_file, sheet_name: str) -> tuple:
+    """Return the header row of a sheet, or an empty tuple for an empty sheet"""
+    rows = read_sheet_rows(excel_file, sheet_name, 1)
+    return rows[0] if rows else ()
+
+def load_sheet_previews(file_path: str, sheet_names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Return sheet names plus a head/row-count preview for the requested sheets (all by default)
+    
+    Previews are cached on disk per workbook version; sheets missing from the cache are parsed
+    and merged in, so a header-filtered run and a full run share the same entry.
+    """
+    metadata = load_cached_metadata(file_path, 'sheet_previews') or {'sheet_names': None, 'sheets': {}}
+    wanted = sheet_names if sheet_names is not None else metadata['sheet_names']
+    missing = None if wanted is None else [name for name in wanted if name not in metadata['sheets']]
+    
+    if missing is None or missing:
+        excel_file = pd.ExcelFile(file_path, **excel_engine_options(file_path))
+        metadata['sheet_names'] = excel_file.sheet_names
+        if missing is None:
+            missing = [name for name in excel_file.sheet_names if name not in metadata['sheets']]
+        
+        for sheet_name in missing:
+            try:
+                df = excel_file.parse(sheet_name)
+                metadata['sheets'][sheet_name] = {'head': df.head(PREVIEW_ROWS), 'rows': len(df)}
+            except Exception as e:
+                metadata['sheets'][sheet_name] = {'error': str(e)}
+        
+        save_cached_metadata(file_path, 'sheet_previews', metadata)
+    
+    return metadata
+
+def _local_name(tag: str) -> str:
+    """Strip the XML namespace from a tag so both transitional and strict OOXML match"""
+    return tag.rsplit('}', 1)[-1]
+
+def _column_index(cell_ref: str) -> int:
+    """Convert the letters of an A1-style cell reference to a zero-based column index"""
+    index = 0
+    for char in cell_ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + (ord(char.upper()) - 64)
+    return index - 1
+
+def _sheet_xml_paths(archive: zipfile.ZipFile) -> Dict[str, str]:
+    """Map sheet names to their worksheet XML paths, in workbook order"""
+    targets = {}
+    with archive.open('xl/_rels/workbook.xml.rels') as rels:
+        for _, elem in ElementTree.iterparse(rels):
+            if _local_name(elem.tag) == 'Relationship':
+                target = elem.get('Target', '')
+                targets[elem.get('Id')] = target.lstrip('/') if target.startswith('/') else f"xl/{target}"
+    
+    paths = {}
+    with archive.open('xl/workbook.xml') as workbook:
+        for _, elem in ElementTree.iterparse(workbook):
+            if _local_name(elem.tag) == 'sheet':
+                rel_id = next((value for key, value in elem.attrib.items() if _local_name(key) == 'id'), None)
+                if rel_id in targets:
+                    paths[elem.get('name')] = targets[rel_id]
+    return paths
+
+def _header_cells(archive: zipfile.ZipFile, sheet_path: str) -> List[tuple]:
+    """Stream a worksheet up to its first row and return that row's (column, type, value) cells
+    
+    pandas always takes spreadsheet row 1 as the header, so a sheet whose first stored row is
+    further down has an empty header.
+    """
+    with archive.open(sheet_path) as sheet:
+        for _, elem in ElementTree.iterparse(sheet):
+            if _local_name(elem.tag) != 'row':
+                continue
+            if elem.get('r', '1') != '1':
+                return []
+            
+            cells = []
+            for position, cell in enumerate(c for c in elem if _local_name(c.tag) == 'c'):
+                cell_type = cell.get('t', 'n')
+                if cell_type == 'inlineStr':
+                    value = ''.join(t.text or '' for t in cell.iter() if _local_name(t.tag) == 't')
+                else:
+                    value = next((v.text for v in cell if _local_name(v.tag) == 'v'), None)
+                
+                if value not in (None, ''):
+                    column = _column_index(cell.get('r')) if cell.get('r') else position
+                    cells.append((column, cell_type, value))
+            return cells
+    return []
+
+def _shared_strings(archive: zipfile.ZipFile, count: int) -> List[str]:
+    """Read the first count entries of the shared string table and stop"""
+    strings = []
+    if count <= 0 or 'xl/sharedStrings.xml' not in archive.namelist():
+        return strings
+    
+    with archive.open('xl/sharedStrings.xml') as shared:
+        for _, elem in ElementTree.iterparse(shared):
+            if _local_name(elem.tag) != 'si':
+                continue
+            strings.append(''.join(t.text or '' for t in elem.iter() if _local_name(t.tag) == 't'))
+            elem.clear()
+            if len(strings) >= count:
+                break
+    return strings
+
+def read_xlsx_headers(file_path: str) -> Optional[Dict[str, List[Any]]]:
+    """Read only the header row of every sheet straight from the XLSX zip
+    
+    No cell data beyond the first row is parsed, and the shared string table is only read
+    as far as the header cells need. Empty header cells are named 'Unnamed: N' like pandas.
+    Returns None for non-XLSX files or anything unexpected, so callers can fall back to pandas.
+    """
+    if not file_path.lower().endswith(('.xlsx', '.xlsm')):
+        return None
+    
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            first_rows = {name: _header_cells(archive, path) for name, path in _sheet_xml_paths(archive).items()}
+            shared_needed = max(
+                (int(value) + 1 for cells in first_rows.values() for _, cell_type, value in cells if cell_type == 's'),
+                default=0
+            )
+            shared = _shared_strings(archive, shared_needed)
+    except Exception:
+        return None
+    
+    headers = {}
+    for sheet_name, cells in first_rows.items():
+        width = max((column for column, _, _ in cells), default=-1) + 1
+        columns = [f"Unnamed: {i}" for i in range(width)]
+        for column, cell_type, value in cells:
+            columns[column] = shared[int(value)] if cell_type == 's' else value
+        headers[sheet_name] = columns
+    return headers
@@ -1,11 +1,36 @@
 # src/utils/logger.py
 """Logging utility without Unicode emojis to avoid Windows console issues"""
 import logging
+import logging.handlers
 import os
 import sys
 from datetime import datetime
 from config.settings import Config
 
+# File records are written in batches of this many; warnings, errors and shutdown flush immediately
+LOG_BUFFER_CAPACITY = 1000
+
+# One buffered handler on the daily log file, shared by every logger so records stay in order
+_buffered_file_handler = None
+
+def _get_buffered_file_handler(formatter: logging.Formatter) -> logging.Handler:
+    """Return the shared buffered file handler, creating it on first use"""
+    global _buffered_file_handler
+    if _buffered_file_handler is None:
+        log_file = os.path.join(
+            Config.LOGS_DIR, 
+            f'erf_automation_{datetime.now().strftime("%Y%m%d")}.log'
+        )
+        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        file_handler.setFormatter(formatter)
+        
+        # Buffer file records so per-item INFO logs aren't one write each; the level
+        # filtering is left to each logger
+        _buffered_file_handler = logging.handlers.MemoryHandler(
+            capacity=LOG_BUFFER_CAPACITY, flushLevel=logging.WARNING, target=file_handler
+        )
+    return _buffered_file_handler
+
 def setup_logger(name: str, level: int = logging.INFO) -> logging.Logger:
     """Set up logger with file and console handlers (no Unicode emojis)"""
     
@@ -25,14 +50,8 @@ def setup_logger(name: str, level: int = logging.INFO) -> logging.Logger:
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     
-    # File handler
-    log_file = os.path.join(
-        Config.LOGS_DIR, 
-        f'erf_automation_{datetime.now().strftime("%Y%m%d")}.log'
-    )
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
-    file_handler.setLevel(level)
-    file_handler.setFormatter(formatter)
+    # File handler (shared and buffered)
+    buffered_file_handler = _get_buffered_file_handler(formatter)
     
     # Console handler with UTF-8 encoding for Windows
     console_handler = logging.StreamHandler(sys.stdout)
@@ -40,7 +59,7 @@ def setup_logger(name: str, level: int = logging.INFO) -> logging.Logger:
     console_handler.setFormatter(formatter)
     
     # Add handlers
-    logger.addHandler(file_handler)
+    logger.addHandler(buffered_file_handler)
     logger.addHandler(console_handler)
     
     return logger
\ No newline at end of file
@@ -0,0 +1,63 @@
+# src/utils/sheet_cache.py
+"""On-disk cache for workbook metadata, keyed by the workbook's path, mtime and size"""
+import hashlib
+import os
+import pickle
+import pandas as pd
+from typing import Any, Optional
+from config.settings import Config
+
+# Parquet (columnar, no XML to parse) needs pyarrow; without it frames are pickled instead
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+CACHE_DIR = os.path.join(Config.DATA_DIR, '.cache')
+
+def _cache_path(file_path: str, namespace: str, extension: str = 'pkl') -> str:
+    """Build the cache file path for a workbook; any change to the file yields a new key"""
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, f"{namespace}_{digest}.{extension}")
+
+def load_cached_metadata(file_path: str, namespace: str) -> Optional[Any]:
+    """Return cached metadata for the workbook, or None on a miss or unreadable entry"""
+    try:
+        with open(_cache_path(file_path, namespace), 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+def save_cached_metadata(file_path: str, namespace: str, metadata: Any):
+    """Store metadata for the workbook; caching is best-effort and never raises"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(_cache_path(file_path, namespace), 'wb') as f:
+            pickle.dump(metadata, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        pass
+
+def load_cached_frame(file_path: str, namespace: str) -> Optional[pd.DataFrame]:
+    """Return a cached DataFrame for the workbook, or None on a miss or unreadable entry"""
+    if not PARQUET_AVAILABLE:
+        return load_cached_metadata(file_path, namespace)
+    
+    try:
+        return pd.read_parquet(_cache_path(file_path, namespace, 'parquet'))
+    except Exception:
+        return None
+
+def save_cached_frame(file_path: str, namespace: str, df: pd.DataFrame):
+    """Store a DataFrame for the workbook (Parquet when available); best-effort, never raises"""
+    if not PARQUET_AVAILABLE:
+        save_cached_metadata(file_path, namespace, df)
+        return
+    
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        df.to_parquet(_cache_path(file_path, namespace, 'parquet'))
+    except Exception:
+        pass
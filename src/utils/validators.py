@@ -3,6 +3,7 @@ import os
 import pandas as pd
 from typing import List, Tuple
 from config.settings import Config
+from src.utils.excel_reader import excel_engine_options, read_sheet_rows
 
 def validate_excel_file(file_path: str) -> Tuple[bool, str]:
     """Validate if Excel file exists and is accessible"""
@@ -13,15 +14,19 @@ def validate_excel_file(file_path: str) -> Tuple[bool, str]:
         return False, "File must be an Excel file (.xlsx or .xls)"
     
     try:
-        # Try to read first few rows
-        pd.read_excel(file_path, nrows=1)
+        # Open the workbook and stream the first row of its first sheet (no DataFrame or dtype inference)
+        with pd.ExcelFile(file_path, **excel_engine_options(file_path)) as excel_file:
+            read_sheet_rows(excel_file, excel_file.sheet_names[0], 1)
         return True, "File is valid"
     except Exception as e:
         return False, f"Cannot read Excel file: {str(e)}"
 
 def validate_dataframe_columns(df: pd.DataFrame) -> Tuple[bool, str, List[str]]:
     """Validate if DataFrame has required columns"""
-    df_columns = list(df.columns)
+    # Hash the frame's columns once; REQUIRED_COLUMNS keeps the reported order
+    df_columns = set(df.columns)
+    if Config.REQUIRED_COLUMNS_FROZEN <= df_columns:
+        return True, "All required columns present", []
     missing_columns = [col for col in Config.REQUIRED_COLUMNS if col not in df_columns]
     
     if missing_columns:
@@ -1,13 +1,13 @@
 # test_resolver.py
 """Test script to verify Outlook auto-complete resolution"""
 
-from src.utils.email_resolver import EmailResolver
+from src.utils.email_resolver import get_email_resolver
 
 def test_specific_users():
     """Test resolution for your specific problematic users"""
     
     # Initialize resolver
-    resolver = EmailResolver()
+    resolver = get_email_resolver()
     
     # Test users that were missing from your mapping
     test_users = ['CHAEBY', 'ALIHA', 'BANGADI', 'BALAKYA', 'BANSASO']
@@ -32,7 +32,7 @@ def test_bulk_resolution():
         # Add the rest of your 41 users here
     ]
     
-    resolver = EmailResolver()
+    resolver = get_email_resolver()
     
     print("Bulk Testing Outlook Auto-Complete Resolution")
     print("=" * 60)